@@ -0,0 +1,46 @@
+# bench_sort.py
+# SORT 트래커의 프레임당 처리 시간 측정 (객체 수별)
+import numpy as np
+from time import perf_counter
+from sort import Sort
+
+OBJECT_COUNTS = (5, 50, 200)  # 한 프레임의 객체 수 (혼잡한 거리: 사람, 볼라드 다수)
+FRAMES = 300
+IMAGE_SIZE = (640, 480)
+SEED = 0
+
+
+def make_sequence(num_objects, frames=FRAMES, seed=SEED):
+    """등속으로 움직이는 박스에 위치 잡음과 미검출을 섞은 detection 시퀀스 생성"""
+    rng = np.random.default_rng(seed)
+    w_img, h_img = IMAGE_SIZE
+    sizes = rng.uniform(10, 60, (num_objects, 2))
+    centers = rng.uniform((0, 0), (w_img, h_img), (num_objects, 2))
+    velocities = rng.normal(0, 2, (num_objects, 2))
+
+    sequence = []
+    for _ in range(frames):
+        centers = (centers + velocities) % (w_img, h_img)
+        noisy = centers + rng.normal(0, 1, centers.shape)
+        boxes = np.hstack((noisy - sizes / 2, noisy + sizes / 2))
+        scores = rng.uniform(0.6, 1.0, (num_objects, 1))
+        visible = rng.random(num_objects) > 0.1  # 10% 미검출
+        sequence.append(np.hstack((boxes, scores))[visible])
+    return sequence
+
+
+def run(tracker, sequence):
+    """프레임별 트래커 결과와 프레임당 평균 처리 시간(ms) 반환"""
+    outputs = []
+    start = perf_counter()
+    for dets in sequence:
+        outputs.append(tracker.update(dets))
+    elapsed = perf_counter() - start
+    return outputs, elapsed / len(sequence) * 1000
+
+
+if __name__ == "__main__":
+    for num_objects in OBJECT_COUNTS:
+        sequence = make_sequence(num_objects)
+        _, ms_per_frame = run(Sort(min_hits=1, max_age=5), sequence)
+        print(f"객체 {num_objects:>3}개: 프레임당 {ms_per_frame:.3f} ms")
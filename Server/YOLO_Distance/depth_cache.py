@@ -0,0 +1,65 @@
+# depth_cache.py
+import numpy as np
+
+
+def paired_iou(a, b):
+    """같은 행끼리의 IoU: a, b (N,4) [x1,y1,x2,y2]"""
+    xx1 = np.maximum(a[:, 0], b[:, 0])
+    yy1 = np.maximum(a[:, 1], b[:, 1])
+    xx2 = np.minimum(a[:, 2], b[:, 2])
+    yy2 = np.minimum(a[:, 3], b[:, 3])
+    inter = np.maximum(0., xx2 - xx1) * np.maximum(0., yy2 - yy1)
+    union = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) + (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+class TrackDepthCache:
+    """트랙별 마지막 스테레오 거리 캐시
+    refresh_interval 프레임이 지났거나 박스가 크게 바뀐(IoU < min_iou) 트랙만 다시 계산"""
+
+    __slots__ = ("refresh_interval", "min_iou", "_distance", "_box", "_frame", "_clock")
+
+    def __init__(self, refresh_interval=5, min_iou=0.7):
+        self.refresh_interval = refresh_interval
+        self.min_iou = min_iou
+        self._distance = {}  # 트랙 ID → 거리 (cm, 계산 실패 시 NaN)
+        self._box = {}       # 트랙 ID → 거리를 계산한 박스
+        self._frame = {}     # 트랙 ID → 거리를 계산한 프레임 번호
+        self._clock = 0
+
+    def __len__(self):
+        return len(self._distance)
+
+    def tick(self):
+        """새 프레임 시작"""
+        self._clock += 1
+
+    def stale(self, track_ids, boxes):
+        """다시 계산해야 하는 트랙 (N,) bool"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        known = np.array([tid in self._distance for tid in track_ids], dtype=bool)
+        stale = ~known
+        if known.any():
+            ids = [tid for tid, k in zip(track_ids, known) if k]
+            age = self._clock - np.array([self._frame[tid] for tid in ids])
+            cached = np.array([self._box[tid] for tid in ids], dtype=np.float64)
+            stale[known] = (age >= self.refresh_interval) | (paired_iou(boxes[known], cached) < self.min_iou)
+        return stale
+
+    def update(self, track_ids, boxes, distances):
+        for tid, box, distance in zip(track_ids, boxes, distances):
+            self._distance[tid] = float(distance)
+            self._box[tid] = box
+            self._frame[tid] = self._clock
+
+    def get(self, track_ids):
+        """트랙별 캐시된 거리 (없으면 NaN)"""
+        return np.array([self._distance.get(tid, np.nan) for tid in track_ids], dtype=np.float64)
+
+    def remove(self, track_ids):
+        """SORT가 삭제한 트랙 제거"""
+        for tid in track_ids:
+            tid = int(tid)
+            self._distance.pop(tid, None)
+            self._box.pop(tid, None)
+            self._frame.pop(tid, None)
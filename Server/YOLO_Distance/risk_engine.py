@@ -0,0 +1,65 @@
+# risk_engine.py
+import numpy as np
+
+PROXIMITY_LEVELS = ("far", "medium", "close", "very_close")
+RISK_LEVELS = ("low", "medium", "high")
+FAR, MEDIUM, CLOSE, VERY_CLOSE = range(4)
+LOW, MEDIUM_RISK, HIGH = range(3)
+
+
+class RiskEngine:
+    """프레임의 모든 추적 객체에 대한 근접도/중앙 영역/접근 여부/위험도를 NumPy로 한 번에 판단
+    (클래스 ID → 임계값 표는 모델 로드 시 한 번만 만듦)"""
+
+    def __init__(self, names, proximity_thresholds, center_ratio=0.6, approach_ratio=1.2,
+                 distance_thresholds=(200, 400)):
+        if not isinstance(names, dict):
+            names = dict(enumerate(names))
+        default = proximity_thresholds["default"]
+        self.thresholds = np.array(
+            [proximity_thresholds.get(names.get(i, "").lower(), default) for i in range(max(names, default=-1) + 1)],
+            dtype=np.float64,
+        ).reshape(-1, 3)
+        self.center_ratio = center_ratio
+        self.approach_ratio = approach_ratio
+        self.distance_thresholds = distance_thresholds  # 스테레오 거리(cm) 기준 high / medium 경계
+
+    def proximity(self, cls, area):
+        """클래스별 면적 임계값으로 근접도 단계 (FAR~VERY_CLOSE)"""
+        t = self.thresholds[cls]
+        return np.select([area > t[:, 2], area > t[:, 1], area > t[:, 0]], [VERY_CLOSE, CLOSE, MEDIUM], FAR)
+
+    @staticmethod
+    def box_areas(xyxy, area_scale=1.0):
+        """박스 면적 (N,), 박스 좌표 자료형(float32)으로 계산한 뒤 축소 디코딩 배율 보정"""
+        xyxy = np.asarray(xyxy).reshape(-1, 4)
+        return ((xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])).astype(np.float64) / area_scale
+
+    def evaluate(self, area, cls, right_edge, matched, growth, width, distance=None):
+        """area (N,) 면적, cls (N,), right_edge (N,) 박스 오른쪽 x 좌표, matched (N,) 오른쪽 매칭 여부,
+        growth (N,) 프레임당 면적 증가 배율 (기록이 없으면 NaN),
+        distance (N,) 스테레오 거리 cm (없으면 NaN), 주어지면 면적 기준과 거리 기준 중 높은 위험도 사용
+        (근접도 단계, 위험도 단계, 접근 여부) 배열 반환"""
+        area = np.asarray(area, dtype=np.float64)
+        proximity = self.proximity(np.asarray(cls, dtype=int), area)
+
+        # 중앙 영역 판단 (왼쪽 박스 오른쪽 끝이 화면 60% 이후) + 오른쪽 카메라 매칭
+        both_center = (np.trunc(right_edge) > width * self.center_ratio) & np.asarray(matched, dtype=bool)
+
+        # 위험도 판단 (중앙에 있으면 위험도 강화)
+        risk = np.select(
+            [(proximity == VERY_CLOSE) | ((proximity == CLOSE) & both_center),
+             (proximity == CLOSE) | ((proximity == MEDIUM) & both_center)],
+            [HIGH, MEDIUM_RISK], LOW,
+        )
+        if distance is not None:
+            distance = np.asarray(distance, dtype=np.float64)
+            with np.errstate(invalid="ignore"):
+                near, mid = distance < self.distance_thresholds[0], distance < self.distance_thresholds[1]
+            risk = np.maximum(risk, np.select([near, mid], [HIGH, MEDIUM_RISK], LOW))
+
+        # 접근 여부 판단 (면적이 프레임당 approach_ratio배 이상 커지면 한 단계 상향)
+        with np.errstate(invalid="ignore"):
+            approaching = np.asarray(growth, dtype=np.float64) > self.approach_ratio
+        risk = np.minimum(risk + approaching, HIGH)
+        return proximity, risk, approaching
@@ -0,0 +1,85 @@
+# session_manager.py
+import bisect
+import hashlib
+import threading
+import multiprocessing
+
+
+class DeviceSession:
+    """글래스 한 대의 독립 상태 (트래커, 접근 이력, 프레임 버퍼, 좌/우 페어링)"""
+
+    def __init__(self, device_id, tracker, history, frame_buffer, pairer, pub_topic):
+        self.device_id = device_id
+        self.tracker = tracker
+        self.history = history  # 트랙별 최근 면적 (TrackHistory, SORT가 삭제한 트랙은 제거)
+        self.frame_buffer = frame_buffer
+        self.pairer = pairer
+        self.pub_topic = pub_topic
+
+
+class SessionManager:
+    """기기 ID별 세션을 첫 프레임이 들어올 때 생성하여 관리"""
+
+    def __init__(self, create_session):
+        self._create_session = create_session
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, device_id):
+        with self._lock:
+            session = self._sessions.get(device_id)
+            if session is None:
+                session = self._sessions[device_id] = self._create_session(device_id)
+            return session
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._sessions.values()))
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """기기 ID → 워커 번호 (워커 수가 바뀌어도 대부분의 기기는 같은 워커에 남음)"""
+
+    def __init__(self, nodes, replicas=64):
+        points = sorted((_hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def get_node(self, key):
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+class WorkerPool:
+    """기기 세션을 일관된 해싱으로 워커 프로세스에 나누어 배정하고 프레임을 전달"""
+
+    def __init__(self, num_workers, target):
+        # CUDA 초기화가 fork 이후 깨지지 않도록 spawn 사용
+        context = multiprocessing.get_context("spawn")
+        self.inboxes = [context.Queue() for _ in range(num_workers)]
+        self.workers = [
+            context.Process(target=target, args=(index, inbox), daemon=True)
+            for index, inbox in enumerate(self.inboxes)
+        ]
+        self.ring = ConsistentHashRing(range(num_workers))
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def route(self, device_id, item):
+        self.inboxes[self.ring.get_node(device_id)].put(item)
+
+    def stop(self):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
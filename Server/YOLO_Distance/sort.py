@@ -1,6 +1,6 @@
 # sort.py
 import numpy as np
-from filterpy.kalman import KalmanFilter
+from scipy.optimize import linear_sum_assignment
 
 def iou(bb_test, bb_gt):
     xx1 = np.maximum(bb_test[0], bb_gt[0])
@@ -14,6 +14,21 @@ def iou(bb_test, bb_gt):
               + (bb_gt[2]-bb_gt[0])*(bb_gt[3]-bb_gt[1]) - wh)
     return(o)
 
+def iou_batch(bb_test, bb_gt):
+    """모든 (detection, tracker) 쌍의 IoU를 broadcast로 한 번에 계산, shape (len(bb_test), len(bb_gt))"""
+    bb_test = np.expand_dims(bb_test, 1)
+    bb_gt = np.expand_dims(bb_gt, 0)
+    xx1 = np.maximum(bb_test[..., 0], bb_gt[..., 0])
+    yy1 = np.maximum(bb_test[..., 1], bb_gt[..., 1])
+    xx2 = np.minimum(bb_test[..., 2], bb_gt[..., 2])
+    yy2 = np.minimum(bb_test[..., 3], bb_gt[..., 3])
+    w = np.maximum(0., xx2 - xx1)
+    h = np.maximum(0., yy2 - yy1)
+    wh = w * h
+    o = wh / ((bb_test[..., 2]-bb_test[..., 0])*(bb_test[..., 3]-bb_test[..., 1])
+              + (bb_gt[..., 2]-bb_gt[..., 0])*(bb_gt[..., 3]-bb_gt[..., 1]) - wh)
+    return(o)
+
 def convert_bbox_to_z(bbox):
     w = bbox[2] - bbox[0]
     h = bbox[3] - bbox[1]
@@ -23,6 +38,13 @@ def convert_bbox_to_z(bbox):
     r = w / float(h)
     return np.array([x, y, s, r]).reshape((4, 1))
 
+def convert_bbox_to_z_batch(bboxes):
+    """박스 배열 (N, 4+)을 관측 배열 (N, 4) [cx, cy, 면적, 가로세로비]로 변환"""
+    bboxes = np.asarray(bboxes, dtype=float)
+    w = bboxes[:, 2] - bboxes[:, 0]
+    h = bboxes[:, 3] - bboxes[:, 1]
+    return np.stack((bboxes[:, 0] + w / 2., bboxes[:, 1] + h / 2., w * h, w / h), axis=1)
+
 def convert_x_to_bbox(x, score=None):
     w = np.sqrt(x[2] * x[3])
     h = x[2] / w
@@ -35,137 +57,191 @@ def convert_x_to_bbox(x, score=None):
     else:
         return np.array([x1, y1, x2, y2, score]).reshape((1, 5))
 
-class KalmanBoxTracker:
-    count = 0
-
-    def __init__(self, bbox):
-        self.kf = KalmanFilter(dim_x=7, dim_z=4)
-        self.kf.F = np.array([[1,0,0,0,1,0,0],
-                              [0,1,0,0,0,1,0],
-                              [0,0,1,0,0,0,1],
-                              [0,0,0,1,0,0,0],
-                              [0,0,0,0,1,0,0],
-                              [0,0,0,0,0,1,0],
-                              [0,0,0,0,0,0,1]])
-        self.kf.H = np.array([[1,0,0,0,0,0,0],
-                              [0,1,0,0,0,0,0],
-                              [0,0,1,0,0,0,0],
-                              [0,0,0,1,0,0,0]])
-        self.kf.R[2:,2:] *= 10.
-        self.kf.P[4:,4:] *= 1000.  # give high uncertainty to the unobservable initial velocities
-        self.kf.P *= 10.
-        self.kf.Q[-1,-1] *= 0.01
-        self.kf.Q[4:,4:] *= 0.01
-
-        self.kf.x[:4] = convert_bbox_to_z(bbox)
-        self.time_since_update = 0
-        self.id = KalmanBoxTracker.count
-        KalmanBoxTracker.count += 1
-        self.history = []
-        self.hits = 0
-        self.hit_streak = 0
-        self.age = 0
-
-    def update(self, bbox):
-        self.time_since_update = 0
-        self.history = []
-        self.hits += 1
-        self.hit_streak += 1
-        self.kf.update(convert_bbox_to_z(bbox))
+def convert_x_to_bbox_batch(x):
+    """상태 배열 (N, 7)을 박스 배열 (N, 4) [x1, y1, x2, y2]로 변환"""
+    w = np.sqrt(x[:, 2] * x[:, 3])
+    h = x[:, 2] / w
+    return np.stack((x[:, 0] - w / 2., x[:, 1] - h / 2., x[:, 0] + w / 2., x[:, 1] + h / 2.), axis=1)
+
+class KalmanFilterBank:
+    """모든 트랙의 칼만 필터 상태를 배열로 묶어 한 번의 행렬 연산으로 predict/update (등속 모델, filterpy와 같은 수식)"""
+    F = np.array([[1,0,0,0,1,0,0],
+                  [0,1,0,0,0,1,0],
+                  [0,0,1,0,0,0,1],
+                  [0,0,0,1,0,0,0],
+                  [0,0,0,0,1,0,0],
+                  [0,0,0,0,0,1,0],
+                  [0,0,0,0,0,0,1]], dtype=float)
+    H = np.eye(4, 7)
+    R = np.diag([1., 1., 10., 10.])
+    Q = np.diag([1., 1., 1., 1., .01, .01, .0001])
+    P0 = np.diag([10., 10., 10., 10., 10000., 10000., 10000.])  # 관측되지 않는 초기 속도에 큰 불확실성 부여
+
+    def __init__(self):
+        self.x = np.empty((0, 7))
+        self.P = np.empty((0, 7, 7))
+
+    def __len__(self):
+        return len(self.x)
+
+    def add(self, bboxes):
+        """새 트랙들의 상태를 박스 [x1, y1, x2, y2]로 초기화하여 추가"""
+        x = np.zeros((len(bboxes), 7))
+        x[:, :4] = convert_bbox_to_z_batch(bboxes)
+        self.x = np.concatenate((self.x, x))
+        self.P = np.concatenate((self.P, np.broadcast_to(self.P0, (len(bboxes), 7, 7))))
+
+    def keep(self, mask):
+        self.x = self.x[mask]
+        self.P = self.P[mask]
 
     def predict(self):
-        if (self.kf.x[6] + self.kf.x[2]) <= 0:
-            self.kf.x[6] *= 0.0
-        self.kf.predict()
-        self.age += 1
-        if self.time_since_update > 0:
-            self.hit_streak = 0
-        self.time_since_update += 1
-        self.history.append(convert_x_to_bbox(self.kf.x))
-        return self.history[-1]
+        # 면적이 음수가 되지 않도록 면적 변화 속도 제거
+        self.x[(self.x[:, 6] + self.x[:, 2]) <= 0, 6] = 0.
+        self.x = self.x @ self.F.T
+        self.P = self.F @ self.P @ self.F.T + self.Q
+
+    def update(self, indices, bboxes):
+        """indices 트랙들을 관측 박스로 갱신 (Joseph form 공분산 갱신)"""
+        if len(indices) == 0:
+            return
+        x = self.x[indices]
+        P = self.P[indices]
+        y = convert_bbox_to_z_batch(bboxes) - x @ self.H.T
+        PHT = P @ self.H.T
+        S = self.H @ PHT + self.R
+        K = PHT @ np.linalg.inv(S)
+        self.x[indices] = x + (K @ y[:, :, None])[:, :, 0]
+        I_KH = np.eye(7) - K @ self.H
+        self.P[indices] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ self.R @ K.transpose(0, 2, 1)
 
     def get_state(self):
-        return convert_x_to_bbox(self.kf.x)
+        return convert_x_to_bbox_batch(self.x)
 
 class Sort:
+    count = 0  # 모든 트래커가 공유하는 트랙 ID 카운터
+
     def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
         self.max_age = max_age
         self.min_hits = min_hits
         self.iou_threshold = iou_threshold
-        self.trackers = []
         self.frame_count = 0
+        # 트랙별 상태 (struct-of-arrays, 모든 배열의 i번째 원소가 같은 트랙)
+        self.kf = KalmanFilterBank()
+        self.ids = np.empty(0, dtype=int)
+        self.time_since_update = np.empty(0, dtype=int)
+        self.hits = np.empty(0, dtype=int)
+        self.hit_streak = np.empty(0, dtype=int)
+        self.age = np.empty(0, dtype=int)
+        self.dropped_ids = np.empty(0, dtype=int)  # 마지막 update에서 삭제된 트랙 ID (출력 ID 기준)
+
+    def _keep(self, mask):
+        self.dropped_ids = np.concatenate((self.dropped_ids, self.ids[~mask] + 1))
+        self.kf.keep(mask)
+        self.ids = self.ids[mask]
+        self.time_since_update = self.time_since_update[mask]
+        self.hits = self.hits[mask]
+        self.hit_streak = self.hit_streak[mask]
+        self.age = self.age[mask]
+
+    def _add(self, bboxes):
+        n = len(bboxes)
+        self.kf.add(bboxes)
+        self.ids = np.concatenate((self.ids, np.arange(Sort.count, Sort.count + n)))
+        Sort.count += n
+        zeros = np.zeros(n, dtype=int)
+        self.time_since_update = np.concatenate((self.time_since_update, zeros))
+        self.hits = np.concatenate((self.hits, zeros))
+        self.hit_streak = np.concatenate((self.hit_streak, zeros))
+        self.age = np.concatenate((self.age, zeros))
+
+    def _confirmed(self):
+        """이번 프레임에 갱신되었고 min_hits를 채운(또는 초기 프레임인) 트랙"""
+        return (self.time_since_update < 1) & (
+            (self.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits))
 
-    def update(self, dets=np.empty((0, 5))):
+    def predict(self):
+        """검출 없이 모든 트랙의 상태만 한 프레임 앞으로 예측 (장면 변화가 없어 추론을 건너뛴 프레임)
+        미검출로 보지 않으므로 트랙 수명/연속 검출 수는 그대로 두고,
+        마지막 update에서 출력된 트랙의 예측 박스 [[x1,y1,x2,y2,id],...] 반환"""
+        self.dropped_ids = np.empty(0, dtype=int)
+        self.kf.predict()
+        state = self.kf.get_state()
+        out_idx = np.flatnonzero(self._confirmed() & ~np.any(np.isnan(state), axis=1))[::-1]
+        if len(out_idx) == 0:
+            return np.empty((0, 5))
+        return np.hstack((state[out_idx], self.ids[out_idx, None] + 1))
+
+    def update(self, dets=np.empty((0, 5)), return_indices=False):
+        """dets: [[x1,y1,x2,y2,score],...] → 확정된 트랙 [[x1,y1,x2,y2,id],...]
+        return_indices=True이면 각 트랙을 갱신(생성)한 dets의 행 인덱스 배열도 함께 반환"""
         self.frame_count += 1
-        trks = np.zeros((len(self.trackers), 5))
-        to_del = []
-        ret = []
-
-        for t, trk in enumerate(trks):
-            pos = self.trackers[t].predict()[0]
-            trk[:4] = pos
-            trk[4] = 0
-            if np.any(np.isnan(pos)):
-                to_del.append(t)
-        trks = np.ma.compress_rows(np.ma.masked_invalid(trks))
-        for t in reversed(to_del):
-            self.trackers.pop(t)
-
-        matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets, trks, self.iou_threshold)
+        self.dropped_ids = np.empty(0, dtype=int)
+        if len(dets) == 0:
+            dets = np.empty((0, 5))
 
-        for m in matched:
-            self.trackers[m[1]].update(dets[m[0], :])
-
-        for i in unmatched_dets:
-            trk = KalmanBoxTracker(dets[i, :])
-            self.trackers.append(trk)
+        # 모든 트랙을 한 번에 예측
+        self.kf.predict()
+        self.age += 1
+        self.hit_streak[self.time_since_update > 0] = 0
+        self.time_since_update += 1
+        trks = self.kf.get_state()
+        valid = ~np.any(np.isnan(trks), axis=1)
+        if not valid.all():
+            self._keep(valid)
+            trks = trks[valid]
 
-        i = len(self.trackers)
-        for trk in reversed(self.trackers):
-            d = trk.get_state()[0]
-            if (trk.time_since_update < 1) and (trk.hit_streak >= self.min_hits or self.frame_count <= self.min_hits):
-                ret.append(np.concatenate((d, [trk.id + 1])).reshape(1, -1))
-            i -= 1
-            if trk.time_since_update > self.max_age:
-                self.trackers.pop(i)
+        matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets, trks, self.iou_threshold)
 
-        if len(ret) > 0:
-            return np.concatenate(ret)
-        return np.empty((0, 5))
+        # 매칭된 트랙을 한 번에 갱신
+        trk_idx = matched[:, 1]
+        self.kf.update(trk_idx, dets[matched[:, 0], :4])
+        self.time_since_update[trk_idx] = 0
+        self.hits[trk_idx] += 1
+        self.hit_streak[trk_idx] += 1
+
+        # 트랙별로 이번 프레임에 대응된 detection 인덱스 (-1: 대응 없음)
+        det_index = np.full(len(self.ids), -1, dtype=int)
+        det_index[trk_idx] = matched[:, 0]
+
+        if len(unmatched_dets) > 0:
+            self._add(dets[unmatched_dets, :4])
+            det_index = np.concatenate((det_index, unmatched_dets))
+
+        # 출력은 트랙 역순 (기존 구현과 같은 순서)
+        state = self.kf.get_state()
+        out_idx = np.flatnonzero(self._confirmed())[::-1]
+        ret = np.hstack((state[out_idx], self.ids[out_idx, None] + 1))
+        ret_index = det_index[out_idx]
+
+        alive = self.time_since_update <= self.max_age
+        if not alive.all():
+            self._keep(alive)
+
+        if len(ret) == 0:
+            ret = np.empty((0, 5))
+        if return_indices:
+            return ret, ret_index
+        return ret
 
 def associate_detections_to_trackers(detections, trackers, iou_threshold=0.3):
     if len(trackers) == 0:
         return np.empty((0, 2), dtype=int), np.arange(len(detections)), np.empty((0,), dtype=int)
+    if len(detections) == 0:
+        return np.empty((0, 2), dtype=int), np.empty((0,), dtype=int), np.arange(len(trackers))
 
-    iou_matrix = np.zeros((len(detections), len(trackers)), dtype=np.float32)
-    for d, det in enumerate(detections):
-        for t, trk in enumerate(trackers):
-            iou_matrix[d, t] = iou(det, trk)
-
-    from scipy.optimize import linear_sum_assignment
-    matched_indices = linear_sum_assignment(-iou_matrix)
-    matched_indices = np.array(list(zip(*matched_indices)))
-
-    unmatched_detections = []
-    for d in range(len(detections)):
-        if d not in matched_indices[:, 0]:
-            unmatched_detections.append(d)
-    unmatched_trackers = []
-    for t in range(len(trackers)):
-        if len(matched_indices.shape) == 2 and t not in matched_indices[:, 1]:
-            unmatched_trackers.append(t)
-
-    matches = []
-    for m in matched_indices:
-        if iou_matrix[m[0], m[1]] < iou_threshold:
-            unmatched_detections.append(m[0])
-            unmatched_trackers.append(m[1])
-        else:
-            matches.append(m.reshape(1, 2))
-    if len(matches) == 0:
-        matches = np.empty((0, 2), dtype=int)
-    else:
-        matches = np.concatenate(matches, axis=0)
+    iou_matrix = iou_batch(detections[:, :4], trackers[:, :4]).astype(np.float32)
+
+    rows, cols = linear_sum_assignment(-iou_matrix)
+    keep = iou_matrix[rows, cols] >= iou_threshold
+    matches = np.stack((rows[keep], cols[keep]), axis=1)
 
-    return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+    # 할당되지 않은 항목 먼저, 그다음 IoU가 낮아 매칭에서 제외된 항목 순서 (기존 결과 순서 유지)
+    det_assigned = np.zeros(len(detections), dtype=bool)
+    det_assigned[rows] = True
+    trk_assigned = np.zeros(len(trackers), dtype=bool)
+    trk_assigned[cols] = True
+    unmatched_detections = np.concatenate((np.flatnonzero(~det_assigned), rows[~keep]))
+    unmatched_trackers = np.concatenate((np.flatnonzero(~trk_assigned), cols[~keep]))
 
+    return matches, unmatched_detections, unmatched_trackers
@@ -0,0 +1,54 @@
+# stereo_verify.py
+import cv2
+import numpy as np
+
+
+class StereoVerifier:
+    """좌/우 박스가 같은 물체인지 ORB 특징점 매칭으로 확인 (박스별 디스크립터는 프레임당 한 번만 계산)"""
+
+    def __init__(self, nfeatures=700, max_distance=50, min_matches=10):
+        self.orb = cv2.ORB_create(nfeatures=nfeatures)
+        # BFMatcher(Hamming)는 한 번만 생성해서 재사용
+        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        self.max_distance = max_distance  # 매칭 거리 임계값
+        self.min_matches = min_matches    # 같은 물체로 볼 최소 매칭 수
+        self.images = {}
+        self._cache = {}
+
+    def set_frame(self, img_left, img_right):
+        """새 프레임 쌍으로 교체하고 이전 프레임의 디스크립터 캐시 비우기"""
+        self.images = {"left": img_left, "right": img_right}
+        self._cache.clear()
+
+    def descriptors(self, side, index, box):
+        """(side, index) 박스의 ORB 디스크립터, 같은 프레임에서는 캐시된 값 반환"""
+        key = (side, index)
+        if key not in self._cache:
+            x1, y1, x2, y2 = map(int, box)
+            roi = self.images[side][y1:y2, x1:x2]
+            des = None
+            if roi.size != 0:
+                _, des = self.orb.detectAndCompute(roi, None)
+            self._cache[key] = des
+        return self._cache[key]
+
+    def match_any(self, left_index, left_box, right_candidates):
+        """왼쪽 박스와 같은 물체인 오른쪽 후보 [(index, box), ...]가 하나라도 있는지 확인
+        후보들의 디스크립터를 이어 붙여 한 번의 매칭으로 처리하고, 매칭을 후보별로 나누어 셈"""
+        des_left = self.descriptors("left", left_index, left_box)
+        if des_left is None or not right_candidates:
+            return False
+
+        des_right = []
+        for index, box in right_candidates:
+            des = self.descriptors("right", index, box)
+            if des is not None:
+                des_right.append(des)
+        if not des_right:
+            return False
+
+        matches = self.matcher.match(des_left, np.vstack(des_right))
+        offsets = np.cumsum([len(des) for des in des_right])[:-1]
+        candidate = np.searchsorted(offsets, [m.trainIdx for m in matches if m.distance < self.max_distance],
+                                    side="right")
+        return candidate.size > 0 and np.bincount(candidate).max() >= self.min_matches
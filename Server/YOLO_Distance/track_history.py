@@ -0,0 +1,77 @@
+# track_history.py
+import numpy as np
+
+
+class TrackHistory:
+    """살아 있는 트랙별 최근 length개 값(면적)을 고정 크기 배열에 보관
+    SORT가 삭제한 트랙은 remove()로 슬롯을 반환하고, 슬롯이 모자라면 가장 오래 갱신되지 않은 트랙을 밀어냄
+    (서버를 오래 실행해도 메모리 사용량이 capacity × length로 고정)"""
+
+    __slots__ = ("capacity", "length", "_values", "_pos", "_stamp", "_clock", "_slots", "_free")
+
+    def __init__(self, capacity=256, length=4):
+        self.capacity = capacity
+        self.length = length
+        self._values = np.full((capacity, length), np.nan)  # 슬롯별 값 링 버퍼 (비어 있으면 NaN)
+        self._pos = np.zeros(capacity, dtype=int)            # 슬롯별 다음 기록 위치
+        self._stamp = np.zeros(capacity, dtype=np.int64)     # 슬롯별 마지막 기록 시점
+        self._clock = 0
+        self._slots = {}                                     # 트랙 ID → 슬롯
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _allocate(self, track_id):
+        if not self._free:
+            # 빈 슬롯이 없으면 가장 오래 갱신되지 않은 트랙 제거
+            oldest = int(np.argmin(self._stamp))
+            victim = next(tid for tid, slot in self._slots.items() if slot == oldest)
+            self.remove([victim])
+        slot = self._free.pop()
+        self._values[slot] = np.nan
+        self._pos[slot] = 0
+        self._stamp[slot] = self._clock
+        self._slots[track_id] = slot
+        return slot
+
+    def append(self, track_ids, values):
+        """트랙별 새 값 기록 (처음 보는 트랙은 슬롯 할당)"""
+        if len(track_ids) == 0:
+            return
+        self._clock += 1
+        slots = np.array([self._slots[tid] if tid in self._slots else self._allocate(tid) for tid in track_ids])
+        self._values[slots, self._pos[slots]] = values
+        self._pos[slots] = (self._pos[slots] + 1) % self.length
+        self._stamp[slots] = self._clock
+
+    def remove(self, track_ids):
+        """삭제된 트랙의 슬롯 반환"""
+        for tid in track_ids:
+            slot = self._slots.pop(int(tid), None)
+            if slot is not None:
+                self._stamp[slot] = 0
+                self._free.append(slot)
+
+    def recent(self, track_ids):
+        """트랙별 최근 값 (오래된 것 → 최근 순, 비어 있으면 NaN), (N, length) 배열"""
+        slots = np.array([self._slots.get(tid, -1) for tid in track_ids], dtype=int)
+        order = (self._pos[slots, None] + np.arange(self.length)) % self.length
+        values = np.take_along_axis(self._values[slots], order, axis=1)
+        values[slots < 0] = np.nan
+        return values
+
+    def growth(self, track_ids):
+        """최근 값들의 로그에 직선을 맞춘 프레임당 증가 배율 (기록이 2개 미만이면 NaN)
+        기록이 2개면 마지막 값 / 이전 값과 같고, 더 많으면 한 프레임의 튀는 값이 완화됨"""
+        logs = np.log(self.recent(track_ids))
+        valid = np.isfinite(logs)
+        n = valid.sum(axis=1)
+        t = np.where(valid, np.arange(self.length), 0.0)
+        y = np.where(valid, logs, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t_mean = t.sum(axis=1) / n
+            y_mean = y.sum(axis=1) / n
+            dt = np.where(valid, t - t_mean[:, None], 0.0)
+            slope = (dt * (y - y_mean[:, None])).sum(axis=1) / (dt ** 2).sum(axis=1)
+        return np.where(n >= 2, np.exp(slope), np.nan)
@@ -1,33 +1,122 @@
 import os
+import sys
 import cv2
 import json
+import threading
 import numpy as np
-from time import sleep
+from time import time, sleep
 from datetime import datetime
 import paho.mqtt.client as mqtt
-from ultralytics import YOLO
 from sort import Sort  # SORT 트래커 추가
+from track_history import TrackHistory
+from depth_cache import TrackDepthCache
+from session_manager import DeviceSession, SessionManager, WorkerPool
+from stereo_verify import StereoVerifier
+from risk_engine import RiskEngine, PROXIMITY_LEVELS, RISK_LEVELS
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from batch_scheduler import BatchScheduler
+from calibration import calibration_path, load_calibration
+from change_gate import ChangeGate
+from detector import Detector, prepare_model
+from file_watcher import DirectoryWatcher
+from frame_buffer import FrameRingBuffer, archive_frame, discard_frame, KEEP_LATEST
+from image_decode import decode_image
+from ingest_queue import IngestQueue
+from metrics import PipelineMetrics, publish_metrics, serve_metrics
+from pipeline import Pipeline, Stage
+from rate_control import RateController
+from stereo_depth import box_disparities, compute_disparity_raw, create_sgbm
+from stereo_pairing import StereoPairer
 
 # MQTT 설정
 BROKER_ADDRESS = "localhost"
 PORT = 1883
 PUB_TOPIC = "esp32cam/processed"
 STATUS_TOPIC = "esp32cam/status"
+STATS_TOPIC = "esp32cam/stats"  # 단계별 지연/FPS 통계 (STATS_INTERVAL마다 전송)
+RIGHT_CAMERA = "cam_0"  # 오른쪽 카메라
+LEFT_CAMERA = "cam_1"   # 왼쪽 카메라
+# 기기별 토픽 esp32/<기기 ID>/cam_0 과 기존 단일 기기 토픽 esp32/cam_0 모두 구독
+CAM_TOPICS = [f"esp32/+/{camera}" for camera in (RIGHT_CAMERA, LEFT_CAMERA)] + \
+             [f"esp32/{camera}" for camera in (RIGHT_CAMERA, LEFT_CAMERA)]
+DEFAULT_DEVICE = "default"  # 기존 토픽(esp32/cam_0, esp32/cam_1)으로 들어오는 기기
+
+# 세션(기기)을 나누어 처리할 워커 프로세스 수 (memory 모드)
+NUM_WORKERS = max(1, (os.cpu_count() or 1) // 4)
+
+# 수신 방식 설정
+# "memory": 이 프로세스가 직접 카메라 토픽을 구독하고 링 버퍼로 전달 (디스크 왕복 없음)
+# "file": dual_image_receiver.py가 저장한 이미지를 디렉토리 감시(inotify)로 받아 읽음
+INGEST_MODE = "memory"
+FRAME_BUFFER_SIZE = 4    # 카메라별 링 버퍼 크기
+# 분석이 밀릴 때의 처리 방식: "drop_oldest", "keep_latest"(최신 프레임 우선), "block"
+BACKPRESSURE_POLICY = KEEP_LATEST
+KEEP_LATEST_FRAMES = 1   # keep_latest 정책에서 카메라별로 남길 최신 프레임 수
+BLOCK_TIMEOUT = 0.1      # block 정책에서 자리가 날 때까지 기다리는 최대 시간 (초), 수신 스레드를 모든 기기가 공유하므로 짧게
+STATS_INTERVAL = 10      # 프레임 수신/처리/폐기 통계 출력 주기 (초)
+ARCHIVE_FRAMES = False   # memory 모드에서도 수신 이미지를 디렉토리에 보관할지 여부
+ARCHIVE_WORKERS = 1      # 보관 이미지 저장 스레드 수 (MQTT 네트워크 스레드에서는 파일을 쓰지 않음)
+ARCHIVE_QUEUE_SIZE = 64  # 저장 대기 이미지 수 (가득 차면 오래된 이미지부터 보관하지 않음)
+MAX_PAIR_SKEW = 0.05     # 좌/우 프레임을 한 쌍으로 인정할 최대 수신 시각 차 (초)
+METRICS_PORT = 9100      # Prometheus 형식 통계 HTTP 포트 (/metrics), 워커 i는 METRICS_PORT + i 사용
+METRICS_HOST = "127.0.0.1"  # 통계 HTTP 바인드 주소 (다른 서버의 수집기에 공개하려면 "0.0.0.0")
 
 # 디렉토리 설정
 SAVE_DIR_0 = "./images_0"  # 오른쪽 카메라
 SAVE_DIR_1 = "./images_1"  # 왼쪽 카메라
+SAVE_DIRS = {RIGHT_CAMERA: SAVE_DIR_0, LEFT_CAMERA: SAVE_DIR_1}
 os.makedirs(SAVE_DIR_0, exist_ok=True)
 os.makedirs(SAVE_DIR_1, exist_ok=True)
 
-# YOLO 모델 로드 (GPU 사용)
-model = YOLO("best.pt")
-model.to('cuda')
-model.model.half()
-model.fuse()
-
-# SORT 트래커 초기화
-tracker = Sort(min_hits=1, max_age=5)
+# YOLO 모델 설정
+# "auto"는 사용 가능한 가장 빠른 백엔드 선택 (cuda → openvino → onnx → cpu)
+# CPU 백엔드는 best.pt를 처음 한 번 ONNX/OpenVINO로 내보내 디스크에 캐시함 (memory 모드는 워커 시작 전에 부모 프로세스에서)
+MODEL_WEIGHTS = "best.pt"
+DETECTOR_BACKEND = "auto"
+# 수신 JPEG를 긴 변이 이 크기 이상인 가장 작은 해상도(1/2, 1/4, 1/8)로 축소 디코딩 (None이면 원본 크기)
+# 근접 판단 면적은 원본 해상도 기준으로 환산하므로 임계값은 그대로 사용
+DECODE_MAX_SIZE = 640
+FRAME_ROTATION = None  # 카메라가 돌아가 있으면 디코딩 시 회전 (예: cv2.ROTATE_90_COUNTERCLOCKWISE)
+
+# 여러 기기(글래스)의 프레임을 모아 한 번에 추론하는 배치 스케줄러
+MAX_BATCH = 8           # 한 번에 추론할 최대 이미지 수
+MAX_BATCH_WAIT = 0.015  # 다른 기기의 프레임을 기다리는 최대 시간 (초)
+
+# 분석 파이프라인 설정 (디코딩 → 검출 → 추적/스테레오 → 위험도 → 전송)
+DECODE_WORKERS = 2        # JPEG 디코딩 스레드 수
+DETECT_WORKERS = 2        # 추론 대기 스레드 수 (다음 프레임 쌍을 미리 스케줄러 배치에 넣음)
+PIPELINE_QUEUE_SIZE = 2   # 단계 사이 대기열 크기 (작을수록 지연이 짧고 밀린 프레임은 링 버퍼에서 폐기)
+
+# 장면 변화 판단: 마지막 추론 프레임과 거의 같으면 YOLO를 건너뛰고 이전 검출 결과로 트래커만 갱신
+CHANGE_GATE = True
+CHANGE_THRESHOLD = 8.0    # 축소 흑백 영상의 블록 평균 밝기 차이 임계값 (0~255)
+REFRESH_INTERVAL = 10     # 장면이 그대로여도 이 프레임 수마다 한 번은 추론
+
+# 카메라 전송 속도 제어: 처리 지연/대기 프레임/위험도에 따라 목표 FPS, JPEG 품질, 해상도를 제어 토픽으로 전송
+RATE_CONTROL = True
+LATENCY_TARGET = 0.3      # 수신→전송 지연 목표 (초), 넘으면 전송 속도를 낮춤
+
+# 모델과 스케줄러는 분석을 실행하는 프로세스(워커)마다 load_model()로 로드
+model = None
+scheduler = None
+risk_engine = None
+
+# 접근 판단: 트랙별 최근 APPROACH_WINDOW개 면적의 증가 추세가 프레임당 APPROACH_RATIO배를 넘으면 접근 중
+# (APPROACH_WINDOW = 2이면 직전 프레임 대비 1.2배 증가로 판단하던 기존 방식과 같음)
+APPROACH_WINDOW = 4
+APPROACH_RATIO = 1.2
+MAX_TRACKS = 256          # 기기별로 접근 이력을 보관할 최대 트랙 수
+
+# 스테레오 거리 융합: 추적 중인 박스에 대해서만 SGBM 시차로 거리(cm)를 계산해 위험도에 반영
+# calibration/<기기 ID>.json이 있는 기기에서만 사용 (좌/우 영상을 평행화하고 캘리브레이션의 B, f 사용)
+# 캘리브레이션이 없으면 거리가 부정확해 잘못된 경고를 낼 수 있으므로 면적 기준으로만 판단
+STEREO_DEPTH = True
+DEPTH_REFRESH_INTERVAL = 5  # 트랙별 거리를 다시 계산하는 프레임 간격
+DEPTH_MIN_IOU = 0.7         # 거리를 계산한 박스와 IoU가 이보다 낮으면(박스가 크게 바뀌면) 바로 다시 계산
+DISPARITY_TRIM = None       # 박스별 대표 시차: None이면 중앙값, 0~0.5 값이면 양쪽 끝을 그 비율만큼 버린 절사 평균
+MIN_DISTANCE = 50           # 탐지할 최소 거리 (cm), SGBM 시차 탐색 범위 결정
+DISTANCE_THRESHOLDS = (200, 400)  # 거리 기준 위험도: 200cm 미만 high, 400cm 미만 medium
 
 # 클래스별 area 기반 근접 판단 임계값
 proximity_thresholds = {
@@ -47,8 +136,67 @@ proximity_thresholds = {
     "default": [2000, 3000, 4000]
 }
 
-def connect_mqtt():
+def load_model():
+    global model, scheduler, risk_engine
+    model = Detector(MODEL_WEIGHTS, backend=DETECTOR_BACKEND)
+    scheduler = BatchScheduler(model, MAX_BATCH, MAX_BATCH_WAIT, conf=0.6, verbose=False)
+    # 클래스 ID별 근접 임계값 표
+    risk_engine = RiskEngine(model.names, proximity_thresholds, approach_ratio=APPROACH_RATIO,
+                             distance_thresholds=DISTANCE_THRESHOLDS)
+
+def parse_camera_topic(topic):
+    """카메라 토픽에서 (기기 ID, 카메라) 추출: esp32/<기기 ID>/cam_0 또는 기존 esp32/cam_0"""
+    parts = topic.split("/")
+    if len(parts) == 2:
+        return DEFAULT_DEVICE, parts[1]
+    return parts[1], parts[2]
+
+def processed_topic(device_id):
+    return PUB_TOPIC if device_id == DEFAULT_DEVICE else f"esp32cam/{device_id}/processed"
+
+def control_topic(device_id):
+    return "esp32cam/control" if device_id == DEFAULT_DEVICE else f"esp32cam/{device_id}/control"
+
+def archive_dir(device_id, camera):
+    return SAVE_DIRS[camera] if device_id == DEFAULT_DEVICE else os.path.join(SAVE_DIRS[camera], device_id)
+
+def archive_image(topic, payload, received_at):
+    """보관 큐 작업자 스레드에서 수신 이미지를 기기/카메라별 디렉토리에 저장"""
+    device_id, camera = parse_camera_topic(topic)
+    archive_frame(archive_dir(device_id, camera), payload, received_at)
+
+def create_session(device_id):
+    """기기마다 독립된 트래커와 프레임 버퍼를 가진 세션 생성"""
+    frame_buffer = FrameRingBuffer([RIGHT_CAMERA, LEFT_CAMERA], FRAME_BUFFER_SIZE,
+                                   policy=BACKPRESSURE_POLICY, keep_latest=KEEP_LATEST_FRAMES,
+                                   block_timeout=BLOCK_TIMEOUT)
+    pairer = StereoPairer(LEFT_CAMERA, RIGHT_CAMERA, MAX_PAIR_SKEW, on_drop=frame_buffer.drop)
+    tracker = Sort(min_hits=1, max_age=5)  # SORT 트래커 초기화
+    history = TrackHistory(MAX_TRACKS, APPROACH_WINDOW)
+    return DeviceSession(device_id, tracker, history, frame_buffer, pairer, processed_topic(device_id))
+
+def connect_mqtt(on_frame=None, archive=None):
     client = mqtt.Client()
+    if on_frame is not None:
+        # 카메라 토픽을 직접 구독해 수신 프레임을 on_frame(기기 ID, 카메라, payload)으로 전달
+        # archive(IngestQueue)가 있으면 이미지 보관은 그 작업자 스레드에 넘김
+        def on_connect(client, userdata, flags, rc):
+            if rc == 0:
+                for topic in CAM_TOPICS:
+                    client.subscribe(topic)
+            else:
+                print(f"MQTT 브로커에 연결 실패, 코드: {rc}")
+
+        def on_message(client, userdata, msg):
+            device_id, camera = parse_camera_topic(msg.topic)
+            if camera not in SAVE_DIRS:
+                return
+            if archive is not None:
+                archive.put(msg.topic, msg.payload)
+            on_frame(device_id, camera, bytes(msg.payload))
+
+        client.on_connect = on_connect
+        client.on_message = on_message
     client.connect(BROKER_ADDRESS, PORT, 60)
     client.loop_start()
     client.publish(STATUS_TOPIC, "connected")
@@ -57,193 +205,366 @@ def connect_mqtt():
 def publish_message(client, topic, message):
     client.publish(topic, json.dumps(message))
 
-def get_latest_images():
-    image_files_0 = sorted(os.listdir(SAVE_DIR_0), key=lambda f: -os.path.getmtime(os.path.join(SAVE_DIR_0, f)))
-    image_files_1 = sorted(os.listdir(SAVE_DIR_1), key=lambda f: -os.path.getmtime(os.path.join(SAVE_DIR_1, f)))
-    if not image_files_0 or not image_files_1:
-        return None, None
-    return os.path.join(SAVE_DIR_0, image_files_0[0]), os.path.join(SAVE_DIR_1, image_files_1[0])
-
-def delete_images(img0_path, img1_path):
-    if os.path.exists(img0_path):
-        os.remove(img0_path)
-    if os.path.exists(img1_path):
-        os.remove(img1_path)
-
-def bbox_area(box):
-    x1, y1, x2, y2 = box.xyxy[0]
-    return (x2 - x1) * (y2 - y1)
-
-def get_proximity(label, area):
-    thresholds = proximity_thresholds.get(label.lower(), proximity_thresholds["default"])
-    if area > thresholds[2]:
-        return "very_close"
-    elif area > thresholds[1]:
-        return "close"
-    elif area > thresholds[0]:
-        return "medium"
-    else:
-        return "far"
-
-def process_images(client):
-    previous_areas = {}  # track_id 기준으로 관리
-    # SIFT 대신 ORB 사용
-    orb = cv2.ORB_create(nfeatures=700)  # 특징점 최대 1000개
-
-    # 특징점 매칭 함수 수정
-    def is_similar(box_l, box_r):
-        x1_l, y1_l, x2_l, y2_l = map(int, box_l)
-        x1_r, y1_r, x2_r, y2_r = map(int, box_r)
-
-        roi_left = img_left[y1_l:y2_l, x1_l:x2_l]
-        roi_right = img_right[y1_r:y2_r, x1_r:x2_r]
-
-        if roi_left.size == 0 or roi_right.size == 0:
-            return False
-
-        kp1, des1 = orb.detectAndCompute(roi_left, None)
-        kp2, des2 = orb.detectAndCompute(roi_right, None)
-
-        if des1 is None or des2 is None:
-            return False
-
-        # BFMatcher(Hamming) 사용
-        bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
-        matches = bf.match(des1, des2)
-
-        # 매칭 거리 기준 필터링
-        good_matches = [m for m in matches if m.distance < 50]  # 임계값 조절 가능
-
-        return len(good_matches) >= 10  # 매칭 임계값
+def watch_directories(frame_buffer):
+    """file 모드: 저장 디렉토리에 새 이미지가 기록되는 즉시 링 버퍼에 추가"""
+    watcher = DirectoryWatcher(
+        SAVE_DIRS, lambda camera, path, timestamp: frame_buffer.put(camera, path=path, timestamp=timestamp)
+    )
+    return watcher.start()
+
+def get_frame_pair(frame_buffer, pairer):
+    """수신 시각이 맞는 (왼쪽, 오른쪽) 프레임 쌍 반환, 없으면 (None, None)"""
+    while True:
+        frame = frame_buffer.get(timeout=0.1)
+        if frame is None:
+            return None, None
+        pair = pairer.add(frame)
+        if pair is not None:
+            return pair
+
+def decode_frame(frame):
+    """프레임을 추론 해상도로 디코딩: (이미지, 원본 대비 배율)"""
+    return decode_image(frame.payload, frame.path, DECODE_MAX_SIZE, FRAME_ROTATION)
+
+def boxes_to_numpy(boxes):
+    """YOLO 결과 박스 전체를 프레임당 한 번에 NumPy로 변환: (xyxy (N,4), conf (N,), cls (N,))"""
+    return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)
+
+def process_images(client, session, metrics=None):
+    """기기 한 대의 프레임 쌍을 분석하여 고위험 객체를 해당 기기 토픽으로 전송
+    (디코딩 → 검출 → 추적/스테레오 → 위험도 → 전송 단계가 각자의 스레드에서 겹쳐서 실행)
+    metrics가 있으면 단계별 처리 시간과 수신→전송 지연을 기록"""
+    frame_buffer = session.frame_buffer
+    pairer = session.pairer
+    tracker = session.tracker
+    history = session.history
+    # SIFT 대신 ORB 사용 (박스별 디스크립터는 프레임당 한 번만 계산)
+    verifier = StereoVerifier(nfeatures=700, max_distance=50, min_matches=10)
+    gate = ChangeGate(CHANGE_THRESHOLD, REFRESH_INTERVAL) if CHANGE_GATE else None
+    last_inferred = {"detections": None, "id_to_index": {}, "matched_ids": set()}  # 추론을 건너뛴 프레임에 재사용
+    rate_controller = RateController(latency_target=LATENCY_TARGET) if RATE_CONTROL else None
+    calibration = load_calibration(calibration_path(session.device_id)) if STEREO_DEPTH else None
+    stereo_depth = calibration is not None
+    if STEREO_DEPTH and not stereo_depth:
+        print(f"[{session.device_id}] 캘리브레이션 파일이 없어 스테레오 거리를 사용하지 않음")
+    depth_cache = TrackDepthCache(DEPTH_REFRESH_INTERVAL, DEPTH_MIN_IOU)
+    stereo_matchers = {}  # 시차 탐색 범위별 SGBM (해상도에 따라 달라짐)
+
+    def read_pairs():
+        last_stats_time = time()
+        while True:
+            if time() - last_stats_time >= STATS_INTERVAL:
+                print(f"[{session.device_id}] 프레임 통계: {frame_buffer.stats()}, 페어링 통계: {pairer.stats()}"
+                      + (f", 추론 통계: {gate.stats()}" if gate is not None else ""))
+                last_stats_time = time()
+
+            frame_left, frame_right = get_frame_pair(frame_buffer, pairer)
+            if frame_left is not None:
+                if metrics is not None:
+                    # 수신 후 버퍼/페어링 대기 시간
+                    metrics.observe("ingest", time() - min(frame_left.timestamp, frame_right.timestamp),
+                                    session.device_id)
+                yield {"frames": (frame_left, frame_right)}
+
+    def decode(job):
+        frame_left, frame_right = job["frames"]
+        img_right, _ = decode_frame(frame_right)
+        img_left, scale = decode_frame(frame_left)
+        if img_right is None or img_left is None:
+            frame_buffer.drop(frame_right)
+            frame_buffer.drop(frame_left)
+            return None
+        if calibration is not None:
+            img_left, img_right = calibration.rectify(img_left, img_right)
+        job["images"] = (img_left, img_right)
+        job["scale"] = scale
+        return job
+
+    def check_change(job):
+        job["infer"] = gate is None or gate.should_infer(*job["images"])
+        return job
+
+    def detect(job):
+        if not job["infer"]:
+            job["detections"] = None  # 장면 변화 없음: 이전 검출 결과 재사용
+            return job
+        # 🔹 YOLO 예측을 두 이미지를 batch로 한 번에 (다른 기기 프레임과 함께 묶일 수 있음)
+        results = scheduler.predict(list(job["images"]), source=session.device_id)
+        # 좌/우 결과를 한 번에 NumPy로 변환 (박스마다 GPU→CPU 복사하지 않음)
+        job["detections"] = (boxes_to_numpy(results[0].boxes), boxes_to_numpy(results[1].boxes))
+        return job
+
+    def track(job):
+        img_left, img_right = job["images"]
+        detections = job["detections"]
+        if detections is None:
+            return predict_tracks(job)
+
+        # 결과 분리
+        (xyxy_left, conf_left, cls_left), (xyxy_right, conf_right, cls_right) = detections
+
+        # 왼쪽 객체들 detection (x1,y1,x2,y2,conf)
+        dets_left = np.hstack((xyxy_left, conf_left[:, None]))
+
+        # SORT 트래커로 ID 추적 (왼쪽 카메라 기준), 트랙마다 원래 detection 인덱스도 받음
+        tracked_left, det_indices = tracker.update(dets_left, return_indices=True)  # [x1,y1,x2,y2,id]
+
+        # ID -> 왼쪽 detection 인덱스 매핑
+        id_to_index = {int(track_id): int(i) for track_id, i in zip(tracked_left[:, 4], det_indices)}
+        # 삭제된 트랙의 접근 이력은 이 프레임의 위험도 판단 후 제거 (위험도 단계도 프레임 순서로 실행)
+        job["dropped_ids"] = tracker.dropped_ids
+
+        # 오른쪽과 매칭 (같은 라벨의 오른쪽 박스 전체를 한 번에 비교)
+        verifier.set_frame(img_left, img_right)
+        matched_ids = set()
+        for track_id, i in id_to_index.items():
+            candidates = [(j, xyxy_right[j]) for j in np.flatnonzero(cls_right == cls_left[i])]
+
+            if verifier.match_any(track_id, xyxy_left[i], candidates):
+                matched_ids.add(track_id)  # 매칭된 ID 저장
+
+        job["id_to_index"] = id_to_index
+        job["matched_ids"] = matched_ids
+        last_inferred["detections"] = detections
+        last_inferred["id_to_index"] = id_to_index
+        last_inferred["matched_ids"] = matched_ids
+        return job
+
+    def predict_tracks(job):
+        """추론을 건너뛴 프레임: 이전 검출을 새 측정값으로 넣지 않고 트래커 예측 박스를 이번 프레임 검출로 사용
+        (클래스/신뢰도와 좌/우 매칭은 트랙이 마지막으로 검출된 프레임의 결과 사용, ORB 계산 생략)"""
+        if last_inferred["detections"] is None:  # 기준 프레임의 추론이 실패한 경우
+            for frame in job["frames"]:
+                frame_buffer.drop(frame)
+            return None
+        (xyxy_left, conf_left, cls_left), right = last_inferred["detections"]
+        predicted = tracker.predict()  # [x1,y1,x2,y2,id]
+        track_ids = predicted[:, 4].astype(int)
+        rows = np.array([last_inferred["id_to_index"][track_id] for track_id in track_ids], dtype=int)
+
+        job["detections"] = ((predicted[:, :4].astype(xyxy_left.dtype), conf_left[rows], cls_left[rows]), right)
+        job["id_to_index"] = {int(track_id): k for k, track_id in enumerate(track_ids)}
+        job["dropped_ids"] = tracker.dropped_ids
+        job["matched_ids"] = last_inferred["matched_ids"] & job["id_to_index"].keys()
+        return job
+
+    def stereo_distances(job, boxes):
+        """박스별 스테레오 거리 (cm, 시차가 없으면 NaN)"""
+        img_left, img_right = job["images"]
+        baseline, focal = calibration.baseline, calibration.focal * calibration.scale(img_left.shape[1])
+        num_disparities = int(np.ceil(baseline * focal / MIN_DISTANCE / 16)) * 16
+        stereo = stereo_matchers.get(num_disparities)
+        if stereo is None:
+            stereo = stereo_matchers[num_disparities] = create_sgbm(num_disparities)
+
+        # 다시 계산할 박스를 덮는 영역에서만 시차 계산
+        gray_left = cv2.cvtColor(img_left, cv2.COLOR_BGR2GRAY)
+        gray_right = cv2.cvtColor(img_right, cv2.COLOR_BGR2GRAY)
+        raw = compute_disparity_raw(stereo, gray_left, gray_right, boxes)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return baseline * focal / box_disparities(raw, boxes, DISPARITY_TRIM)
+
+    def measure_depth(job):
+        # 거리 캐시도 프레임 순서로 갱신되므로 삭제된 트랙은 여기서 제거
+        depth_cache.remove(job["dropped_ids"])
+        track_ids = list(job["id_to_index"])
+        if not stereo_depth or not track_ids:
+            job["distances"] = None
+            return job
+
+        xyxy_left = job["detections"][0][0]
+        boxes = xyxy_left[np.fromiter(job["id_to_index"].values(), dtype=int, count=len(track_ids))]
+        depth_cache.tick()
+        stale = depth_cache.stale(track_ids, boxes)
+        if stale.any():
+            # 거리는 보조 정보이므로 계산에 실패해도 프레임은 버리지 않고 면적 기준으로만 판단
+            try:
+                distances = stereo_distances(job, boxes[stale])
+            except Exception as e:
+                print(f"[{session.device_id}] 스테레오 거리 계산 오류: {e}")
+                distances = np.full(int(stale.sum()), np.nan)
+            depth_cache.update([tid for tid, s in zip(track_ids, stale) if s], boxes[stale], distances)
+
+        job["distances"] = depth_cache.get(track_ids)
+        return job
+
+    def assess(job):
+        h_img, w_img = job["images"][0].shape[:2]
+        matched_ids = job["matched_ids"]
+        area_scale = job["scale"] ** 2  # 축소 디코딩된 면적 → 원본 해상도 면적
+
+        xyxy_left, _, cls_left = job["detections"][0]
+        id_to_index = job["id_to_index"]
+        track_ids = list(id_to_index)
+        indices = np.fromiter(id_to_index.values(), dtype=int, count=len(id_to_index))
+
+        # 모든 추적 객체의 근접도/중앙 영역/접근 여부/위험도를 한 번에 판단
+        boxes = xyxy_left[indices]
+        areas = risk_engine.box_areas(boxes, area_scale)
+        history.append(track_ids, areas)
+        matched = np.array([track_id in matched_ids for track_id in track_ids], dtype=bool)
+        distances = job["distances"]
+        proximities, risks, approachings = risk_engine.evaluate(
+            areas, cls_left[indices], boxes[:, 2], matched, history.growth(track_ids), w_img, distances)
+        history.remove(job["dropped_ids"])
+
+        objects_data = []
+        for k, track_id in enumerate(track_ids):
+            area = float(areas[k])
+            label = model.names[int(cls_left[indices[k]])]
+            proximity = PROXIMITY_LEVELS[proximities[k]]
+            risk_level = RISK_LEVELS[risks[k]]
+            approaching = bool(approachings[k])
+
+            obj = {
+                "id": int(track_id),
+                "label": label,
+                "approaching": approaching,
+                "proximity": proximity,
+                "risk_level": risk_level
+            }
+            if distances is not None and np.isfinite(distances[k]):
+                obj["distance"] = round(float(distances[k]), 2)  # 스테레오 거리 (cm)
+            objects_data.append(obj)
+
+            print(f"Detected {label} (ID {track_id}): Area={area}, Distance={obj.get('distance')}, Proximity={proximity}, Risk={risk_level}, Approaching={approaching}")
+
+        job["objects"] = objects_data
+        return job
+
+    def publish(job):
+        objects_data = job["objects"]
+        frame_left, frame_right = job["frames"]
+
+        # 고위험 객체가 하나라도 있으면 MQTT 전송
+        should_publish = any(obj["risk_level"] == "high" for obj in objects_data)
+
+        if should_publish:
+            # 고위험 객체만 필터링
+            filtered_objects = [obj for obj in objects_data if obj["risk_level"] == "high"]
+            
+            publish_message(client, session.pub_topic, {
+                "timestamp": datetime.now().isoformat(),
+                "objects": filtered_objects  # 필터된 객체만 전송
+            })
+            client.publish(STATUS_TOPIC, "connected")
+            print("MQTT 메시지 전송!\n")
+
+        frame_buffer.mark_processed(frame_right, frame_left)
+        discard_frame(frame_right)
+        discard_frame(frame_left)
+        received_at = min(frame_left.timestamp, frame_right.timestamp)
+        if metrics is not None:
+            metrics.frame_done(received_at, session.device_id)
+
+        if rate_controller is not None:
+            hazard = should_publish or any(obj["approaching"] for obj in objects_data)
+            rate_controller.observe(time() - received_at, hazard=hazard, static=not job["infer"])
+            # 페어링/디코딩 실패는 제외하고 버퍼가 밀려 버린 프레임만 포화 신호로 사용
+            # (짝이 맞지 않는 프레임 때문에 FPS를 낮추면 좌/우 간격이 벌어져 폐기가 더 늘어남)
+            dropped = sum(stats["overflow"] for stats in frame_buffer.stats().values())
+            setting = rate_controller.update(len(frame_buffer) + scheduler.pending(), dropped)
+            if setting is not None:
+                publish_message(client, control_topic(session.device_id), setting)
+                print(f"[{session.device_id}] 카메라 전송 설정 변경: {setting}")
+
+    def on_error(stage, job, error):
+        print(f"[{session.device_id}] {stage.name} 단계 오류: {error}")
+        for frame in job["frames"]:
+            frame_buffer.drop(frame)
+
+    pipeline = Pipeline([
+        Stage("decode", decode, workers=DECODE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE),
+        Stage("gate", check_change, queue_size=PIPELINE_QUEUE_SIZE, ordered=True),
+        Stage("detect", detect, workers=DETECT_WORKERS, queue_size=PIPELINE_QUEUE_SIZE),
+        # 트래커와 접근 판단은 프레임 순서가 중요하므로 순서 보장 단계로 실행
+        Stage("track", track, queue_size=PIPELINE_QUEUE_SIZE, ordered=True),
+        Stage("depth", measure_depth, queue_size=PIPELINE_QUEUE_SIZE, ordered=True),
+        Stage("risk", assess, queue_size=PIPELINE_QUEUE_SIZE, ordered=True),
+        Stage("publish", publish, queue_size=PIPELINE_QUEUE_SIZE),
+    ], on_error=on_error, metrics=metrics, device=session.device_id).start()
+    try:
+        pipeline.run(read_pairs())
+    finally:
+        pipeline.stop()
 
+def start_metrics(client, worker_index=0):
+    """단계별 지연/FPS 집계를 HTTP(/metrics)와 MQTT 통계 토픽으로 제공"""
+    metrics = PipelineMetrics()
+    try:
+        serve_metrics(metrics, METRICS_PORT + worker_index, METRICS_HOST)
+    except OSError as e:
+        print(f"통계 HTTP 서버를 시작할 수 없습니다 (포트 {METRICS_PORT + worker_index}): {e}")
+    publish_metrics(metrics, client, STATS_TOPIC, STATS_INTERVAL, worker=worker_index)
+    return metrics
+
+def worker_main(worker_index, inbox):
+    """워커 프로세스: 배정된 기기 세션들의 프레임을 분석 (세션마다 분석 스레드 하나, 추론은 배치로 공유)"""
+    load_model()
+    client = connect_mqtt()
+    metrics = start_metrics(client, worker_index)
+
+    def start_session(device_id):
+        session = create_session(device_id)
+        threading.Thread(target=process_images, args=(client, session, metrics), daemon=True).start()
+        print(f"[worker {worker_index}] 세션 시작: {device_id}")
+        return session
+
+    sessions = SessionManager(start_session)
     try:
         while True:
-            img0_path, img1_path = get_latest_images()
-            if img0_path is None or img1_path is None:
-                sleep(0.01)
-                continue
-
-            img_right = cv2.imread(img0_path)
-            img_left = cv2.imread(img1_path)
-            if img_right is None or img_left is None:
-                sleep(0.01)
-                continue
-
-            # 🔹 YOLO 예측을 두 이미지를 batch로 한 번에
-            results = model.predict(
-                [img_left, img_right],
-                conf=0.6,           # 원하는 confidence
-                verbose=True        # 로그 출력 줄이기
-            )
-
-            # 결과 분리
-            boxes_left = results[0].boxes
-            boxes_right = results[1].boxes
-
-            h_img, w_img = img_left.shape[:2]
-
-            # 왼쪽 객체들 detection (x1,y1,x2,y2,conf)
-            dets_left = []
-            for box in boxes_left:
-                coords = box.xyxy[0].cpu().numpy()
-                dets_left.append([*coords, box.conf[0].item()])
-            dets_left = np.array(dets_left)
-
-            # SORT 트래커로 ID 추적 (왼쪽 카메라 기준)
-            tracked_left = tracker.update(dets_left)  # [x1,y1,x2,y2,id]
-
-            # ID -> 왼쪽 박스 매핑
-            id_to_box = {}
-            for i, track in enumerate(tracked_left):
-                x1, y1, x2, y2, track_id = track
-                id_to_box[int(track_id)] = boxes_left[i]
-
-            # 오른쪽과 매칭
-            matched_ids = set()
-            for track_id, box_l in id_to_box.items():
-                label_l = model.names[int(box_l.cls[0].item())]
-                box_l_coords = box_l.xyxy[0].cpu().numpy()
-
-                for box_r in boxes_right:
-                    label_r = model.names[int(box_r.cls[0].item())]
-                    box_r_coords = box_r.xyxy[0].cpu().numpy()
-
-                    if label_l == label_r and is_similar(box_l_coords, box_r_coords):
-                        matched_ids.add(int(track_id))  # 매칭된 ID 저장
-                        break
-
-            objects_data = []
-            for track_id, box_l in id_to_box.items():
-                coords_l = box_l.xyxy[0].cpu().numpy()
-                x1_l, y1_l, x2_l, y2_l = map(int, coords_l)
-                area = bbox_area(box_l)
-                label = model.names[int(box_l.cls[0].item())]
-
-                # 중앙 영역 판단
-                center_region_left = x2_l > w_img * 0.6
-                # 오른쪽 매칭 박스가 있으면 어드밴티지
-                if track_id in matched_ids:
-                    center_region_right = True  # 매칭되면 오른쪽 중앙 영역을 확보한 것으로 간주
-                else:
-                    center_region_right = False
-
-                both_center = center_region_left and center_region_right
-                proximity = get_proximity(label, area)
-
-                # 위험도 판단 (중앙에 있으면 위험도 강화)
-                if proximity in ["very_close"] or (proximity in ["close"] and both_center):
-                    risk_level = "high"
-                elif proximity in ["close"] or (proximity in ["medium"] and both_center):
-                    risk_level = "medium"
-                else:
-                    risk_level = "low"
-
-                # 접근 여부 판단
-                approaching = False
-                if track_id in previous_areas:
-                    if area > previous_areas[track_id] * 1.2:
-                        approaching = True
-                previous_areas[track_id] = area
-
-                if approaching:
-                    risk_levels = ["low", "medium", "high"]
-                    current_index = risk_levels.index(risk_level)
-                    if current_index < len(risk_levels) - 1:
-                        risk_level = risk_levels[current_index + 1]
-
-                objects_data.append({
-                    "id": int(track_id),
-                    "label": label,
-                    "approaching": approaching,
-                    "proximity": proximity,
-                    "risk_level": risk_level
-                })
-
-                print(f"Detected {label} (ID {track_id}): Area={area}, Proximity={proximity}, Risk={risk_level}, Approaching={approaching}")
-
-            # 고위험 객체가 하나라도 있으면 MQTT 전송
-            should_publish = any(obj["risk_level"] == "high" for obj in objects_data)
-
-            if should_publish:
-                # 고위험 객체만 필터링
-                filtered_objects = [obj for obj in objects_data if obj["risk_level"] == "high"]
-                
-                publish_message(client, PUB_TOPIC, {
-                    "timestamp": datetime.now().isoformat(),
-                    "objects": filtered_objects  # 필터된 객체만 전송
-                })
-                client.publish(STATUS_TOPIC, "connected")
-                print("MQTT 메시지 전송!\n")
-
-            delete_images(img0_path, img1_path)
-            sleep(0.01)
+            item = inbox.get()
+            if item is None:
+                break
+            device_id, camera, payload, timestamp = item
+            sessions.get(device_id).frame_buffer.put(camera, payload=payload, timestamp=timestamp)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for session in sessions:
+            print(f"[{session.device_id}] 프레임 통계: {session.frame_buffer.stats()}, 페어링 통계: {session.pairer.stats()}")
+        client.loop_stop()
+        client.disconnect()
 
+def serve_devices():
+    """memory 모드: 카메라 토픽을 구독하고 기기 ID별로 워커 프로세스에 프레임 분배"""
+    # 워커마다 같은 파일로 동시에 내보내지 않도록 내보내기는 여기서 한 번만 수행
+    prepare_model(MODEL_WEIGHTS, DETECTOR_BACKEND)
+    pool = WorkerPool(NUM_WORKERS, worker_main).start()
+    archive = IngestQueue(archive_image, ARCHIVE_WORKERS, ARCHIVE_QUEUE_SIZE, STATS_INTERVAL, "archive").start() \
+        if ARCHIVE_FRAMES else None
+    client = connect_mqtt(
+        lambda device_id, camera, payload: pool.route(device_id, (device_id, camera, payload, time())), archive
+    )
+    try:
+        while True:
+            sleep(1)
     except KeyboardInterrupt:
         print("프로그램 종료")
     finally:
         client.loop_stop()
         client.disconnect()
+        pool.stop()
+        if archive is not None:
+            archive.stop()
+
+def serve_files():
+    """file 모드: 수신기가 저장한 단일 기기 이미지를 감시하여 분석"""
+    load_model()
+    client = connect_mqtt()
+    metrics = start_metrics(client)
+    session = create_session(DEFAULT_DEVICE)
+    watch_directories(session.frame_buffer)
+    try:
+        process_images(client, session, metrics)
+    except KeyboardInterrupt:
+        print(f"프로그램 종료 (프레임 통계: {session.frame_buffer.stats()}, 페어링 통계: {session.pairer.stats()})")
+    finally:
+        client.loop_stop()
+        client.disconnect()
 
 if __name__ == "__main__":
-    mqtt_client = connect_mqtt()
-    process_images(mqtt_client)
+    if INGEST_MODE == "memory":
+        serve_devices()
+    else:
+        serve_files()
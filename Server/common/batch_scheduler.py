@@ -0,0 +1,96 @@
+import queue
+import threading
+from concurrent.futures import Future
+from time import monotonic
+
+# 최근 이 시간(초) 안에 프레임을 보낸 기기만 배치 대기 대상으로 봄
+SOURCE_TIMEOUT = 1.0
+
+
+class _Request:
+    __slots__ = ("source", "images", "future")
+
+    def __init__(self, source, images):
+        self.source = source
+        self.images = images
+        self.future = Future()
+
+
+class BatchScheduler:
+    """여러 기기의 프레임을 최대 max_batch장 / max_wait초까지 모아 한 번에 추론하고 결과를 기기별로 돌려줌"""
+
+    def __init__(self, detector, max_batch=8, max_wait=0.015, **predict_kwargs):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.predict_kwargs = predict_kwargs
+        self._requests = queue.Queue()
+        self._last_seen = {}  # 기기별 마지막 요청 시각
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, images, source=None):
+        """이미지 리스트 추론 요청, 결과(Results 리스트)는 Future로 받음"""
+        request = _Request(source, list(images))
+        self._requests.put(request)
+        return request.future
+
+    def predict(self, images, source=None):
+        return self.submit(images, source).result()
+
+    def pending(self):
+        """추론을 기다리는 요청 수"""
+        return self._requests.qsize()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+    def _active_sources(self, now):
+        for source, seen in list(self._last_seen.items()):
+            if now - seen > SOURCE_TIMEOUT:
+                del self._last_seen[source]
+        return set(self._last_seen)
+
+    def _collect(self, first):
+        batch = [first]
+        size = len(first.images)
+        now = monotonic()
+        self._last_seen[first.source] = now
+        waiting_for = self._active_sources(now) - {first.source}
+        deadline = now + self.max_wait
+        # 최근 프레임을 보낸 기기가 모두 모였거나 배치가 찼거나 대기 시간이 지나면 바로 추론
+        while size < self.max_batch and waiting_for:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.images)
+            self._last_seen[request.source] = monotonic()
+            waiting_for.discard(request.source)
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._requests.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = self._collect(first)
+            images = [image for request in batch for image in request.images]
+            try:
+                results = self.detector.predict(images, **self.predict_kwargs)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(results[offset:offset + len(request.images)])
+                offset += len(request.images)
@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+import cv2
+import numpy as np
+
+CALIBRATION_DIR = "./calibration"  # 기기별 캘리브레이션 파일 (<기기 ID>.json) 위치
+MAP_NAMES = ("left_map1", "left_map2", "right_map1", "right_map2")
+
+
+def calibration_path(device_id, calibration_dir=CALIBRATION_DIR):
+    return os.path.join(calibration_dir, f"{device_id}.json")
+
+
+class StereoCalibration:
+    """스테레오 카메라 캘리브레이션과 평행화(rectification) 맵
+    맵은 처음 한 번만 계산해 .npy로 캐시하고 이후에는 메모리 매핑으로 읽으므로 프레임마다 cv2.remap만 수행"""
+
+    def __init__(self, params, cache_dir, cache_key):
+        self.image_size = tuple(params["image_size"])  # (가로, 세로)
+        self.K1 = np.array(params["K1"], dtype=np.float64)
+        self.D1 = np.array(params["D1"], dtype=np.float64)
+        self.K2 = np.array(params["K2"], dtype=np.float64)
+        self.D2 = np.array(params["D2"], dtype=np.float64)
+        self.R = np.array(params["R"], dtype=np.float64)
+        self.T = np.array(params["T"], dtype=np.float64).reshape(3, 1)  # 단위: cm
+
+        self.R1, self.R2, self.P1, self.P2, self.Q, _, _ = cv2.stereoRectify(
+            self.K1, self.D1, self.K2, self.D2, self.image_size, self.R, self.T,
+            flags=cv2.CALIB_ZERO_DISPARITY, alpha=0
+        )
+        self.maps = self._load_maps(cache_dir, cache_key)
+        self._scaled_maps = {}  # 축소 디코딩된 영상 크기별 평행화 맵
+
+    @property
+    def baseline(self):
+        """두 카메라 간 거리 B (cm)"""
+        return float(np.linalg.norm(self.T))
+
+    @property
+    def focal(self):
+        """평행화된 영상의 초점 거리 f (픽셀)"""
+        return float(self.P1[0, 0])
+
+    def disparity_range(self, min_distance):
+        """min_distance(cm)까지의 물체를 찾는 데 필요한 SGBM numDisparities (16의 배수)"""
+        max_disparity = self.baseline * self.focal / min_distance
+        return int(np.ceil(max_disparity / 16)) * 16
+
+    def _load_maps(self, cache_dir, cache_key):
+        os.makedirs(cache_dir, exist_ok=True)
+        paths = [os.path.join(cache_dir, f"{cache_key}_{name}.npy") for name in MAP_NAMES]
+        if not all(os.path.exists(path) for path in paths):
+            maps = []
+            for K, D, R, P in ((self.K1, self.D1, self.R1, self.P1), (self.K2, self.D2, self.R2, self.P2)):
+                maps.extend(cv2.initUndistortRectifyMap(K, D, R, P, self.image_size, cv2.CV_16SC2))
+            for path, rectify_map in zip(paths, maps):
+                np.save(path, rectify_map)
+        return [np.load(path, mmap_mode="r") for path in paths]
+
+    def scale(self, width):
+        """가로 width로 디코딩된 영상의 캘리브레이션 해상도 대비 배율"""
+        return width / self.image_size[0]
+
+    def _maps_for(self, size):
+        if size == self.image_size:
+            return self.maps
+        maps = self._scaled_maps.get(size)
+        if maps is None:
+            # 카메라 행렬을 영상 크기에 맞춰 축소한 뒤 맵 계산 (크기별로 한 번만)
+            S = np.diag([size[0] / self.image_size[0], size[1] / self.image_size[1], 1.0])
+            maps = []
+            for K, D, R, P in ((self.K1, self.D1, self.R1, self.P1), (self.K2, self.D2, self.R2, self.P2)):
+                maps.extend(cv2.initUndistortRectifyMap(S @ K, D, R, S @ P, size, cv2.CV_16SC2))
+            self._scaled_maps[size] = maps
+        return maps
+
+    def rectify(self, img_left, img_right):
+        """좌/우 영상 평행화 (캘리브레이션과 다른 해상도로 디코딩된 영상은 축소한 맵 사용)"""
+        left_map1, left_map2, right_map1, right_map2 = self._maps_for((img_left.shape[1], img_left.shape[0]))
+        return (cv2.remap(img_left, left_map1, left_map2, cv2.INTER_LINEAR),
+                cv2.remap(img_right, right_map1, right_map2, cv2.INTER_LINEAR))
+
+
+def load_calibration(path, cache_dir=None):
+    """캘리브레이션 파일 로드, 파일이 없으면 None (평행화 없이 기본 B, f 사용)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as file:
+        content = file.read()
+    cache_key = os.path.splitext(os.path.basename(path))[0] + "_" + hashlib.sha1(content).hexdigest()[:12]
+    cache_dir = cache_dir or os.path.join(os.path.dirname(path), "cache")
+    return StereoCalibration(json.loads(content), cache_dir, cache_key)
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+
+class ChangeGate:
+    """마지막으로 추론한 프레임과 비교해 장면이 바뀌었을 때만 추론하도록 판단
+    축소한 흑백 영상을 cell×cell 블록으로 나눠 블록별 평균 밝기 차이의 최댓값을 사용
+    (화면 일부에만 새 물체가 나타나도 해당 블록의 차이가 커져 놓치지 않음)"""
+
+    def __init__(self, threshold=8.0, refresh_interval=10, size=(64, 48), cell=8):
+        self.threshold = threshold                # 블록 평균 밝기 차이 임계값 (0~255)
+        self.refresh_interval = refresh_interval  # 연속으로 건너뛸 수 있는 최대 프레임 수
+        self.size = size
+        self.cell = cell
+        self.reference = None
+        self.skipped_in_row = 0
+        self.inferred = 0
+        self.skipped = 0
+
+    def thumbnail(self, images):
+        small = [cv2.cvtColor(cv2.resize(image, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+                 for image in images]
+        return np.stack(small).astype(np.float32)
+
+    def difference(self, thumb):
+        n, h, w = thumb.shape
+        cell = self.cell
+        diff = np.abs(thumb - self.reference)[:, :h - h % cell, :w - w % cell]
+        return float(diff.reshape(n, h // cell, cell, w // cell, cell).mean(axis=(2, 4)).max())
+
+    def should_infer(self, *images):
+        """images가 마지막 추론 프레임과 충분히 다르거나 새로 고칠 때가 되었으면 True (기준 프레임 갱신)"""
+        thumb = self.thumbnail(images)
+        if (self.reference is None or self.reference.shape != thumb.shape
+                or self.skipped_in_row >= self.refresh_interval or self.difference(thumb) > self.threshold):
+            self.reference = thumb
+            self.skipped_in_row = 0
+            self.inferred += 1
+            return True
+        self.skipped_in_row += 1
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {"inferred": self.inferred, "skipped": self.skipped}
@@ -0,0 +1,117 @@
+import os
+import fcntl
+import shutil
+import tempfile
+import importlib.util
+from ultralytics import YOLO
+
+# 백엔드 이름 (BACKENDS 순서가 자동 선택 시 우선순위)
+CUDA = "cuda"          # PyTorch + CUDA (FP16)
+OPENVINO = "openvino"  # OpenVINO (Intel CPU, 선택적으로 INT8)
+ONNX = "onnx"          # ONNX Runtime (CPU, 설치되어 있으면 CUDA provider도 사용)
+TORCH_CPU = "cpu"      # PyTorch CPU
+BACKENDS = (CUDA, OPENVINO, ONNX, TORCH_CPU)
+
+
+def _has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def cuda_available():
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def available_backends():
+    """현재 환경에서 사용 가능한 백엔드 목록 (빠른 순서)"""
+    backends = []
+    if cuda_available():
+        backends.append(CUDA)
+    if _has_module("openvino"):
+        backends.append(OPENVINO)
+    if _has_module("onnxruntime"):
+        backends.append(ONNX)
+    backends.append(TORCH_CPU)
+    return backends
+
+
+def _is_exported(target, weights):
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights)
+
+
+def _move_into_place(exported, target):
+    """내보낸 결과(파일 또는 OpenVINO 디렉토리)를 target 이름으로 옮김"""
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(exported, target)
+
+
+def export_model(weights, backend, imgsz=640, int8=False):
+    """.pt 가중치를 ONNX/OpenVINO로 한 번만 내보내고, 이후에는 디스크에 캐시된 결과를 사용
+    여러 프로세스가 동시에 시작해도 파일 잠금으로 한 프로세스만 내보내며,
+    임시 디렉토리에 내보낸 뒤 이름을 바꾸므로 다른 프로세스가 쓰다 만 파일을 읽지 않음"""
+    base = os.path.splitext(weights)[0]
+    if backend == OPENVINO:
+        target = f"{base}_int8_openvino_model" if int8 else f"{base}_openvino_model"
+    else:
+        target = f"{base}.onnx"
+    if _is_exported(target, weights):
+        return target
+
+    with open(f"{target}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if _is_exported(target, weights):  # 잠금을 기다리는 동안 다른 프로세스가 내보낸 경우
+            return target
+
+        print(f"모델 내보내기: {weights} → {target}")
+        fmt = "openvino" if backend == OPENVINO else "onnx"
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(weights))) as tmp_dir:
+            tmp_weights = os.path.join(tmp_dir, os.path.basename(weights))
+            shutil.copy2(weights, tmp_weights)
+            # 좌/우 이미지를 한 번에 추론할 수 있도록 batch 차원을 동적으로 내보냄
+            exported = YOLO(tmp_weights).export(format=fmt, imgsz=imgsz, dynamic=True,
+                                                int8=int8 and backend == OPENVINO)
+            _move_into_place(str(exported), target)
+    return target
+
+
+def prepare_model(weights, backend="auto", imgsz=640, int8=False):
+    """워커 프로세스를 띄우기 전에 부모 프로세스에서 내보내기를 미리 끝내 둠 (선택된 백엔드 반환)"""
+    if backend == "auto":
+        backend = available_backends()[0]
+    if backend in (OPENVINO, ONNX):
+        export_model(weights, backend, imgsz, int8)
+    return backend
+
+
+class Detector:
+    """백엔드와 관계없이 ultralytics Results(results[i].boxes)를 그대로 돌려주는 YOLO 탐지기"""
+
+    def __init__(self, weights, backend="auto", imgsz=640, int8=False):
+        if backend == "auto":
+            backend = available_backends()[0]
+        if backend not in BACKENDS:
+            raise ValueError(f"지원하지 않는 백엔드: {backend}")
+        self.backend = backend
+        self.imgsz = imgsz
+
+        if backend in (OPENVINO, ONNX):
+            self.model = YOLO(export_model(weights, backend, imgsz, int8), task="detect")
+        else:
+            self.model = YOLO(weights)
+            if backend == CUDA:
+                self.model.to("cuda")
+                self.model.model.half()
+            self.model.fuse()
+        self.names = self.model.names
+        print(f"YOLO 백엔드: {backend} ({weights})")
+
+    def predict(self, images, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        kwargs.setdefault("half", self.backend == CUDA)
+        return self.model.predict(images, **kwargs)
+
+    __call__ = predict
@@ -0,0 +1,170 @@
+import os
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from time import time, sleep
+
+# inotify 이벤트 (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000  # 이벤트 큐가 넘쳐 일부 이벤트가 사라짐 (wd == -1)
+PRUNE_SIZE = 1024           # 전달한 파일 목록이 이 크기를 넘으면 디스크에 남은 파일만 남김
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def write_file(path, data, mtime=None):
+    """감시 디렉토리에 파일 기록: 숨김 임시 파일에 쓰고 수정 시각을 맞춘 뒤 이름을 바꿔 한 번에 나타나게 함
+    (감시자는 IN_MOVED_TO 이벤트에서 완성된 파일과 mtime을 보게 됨)"""
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(tmp_path, (mtime, mtime))
+    os.rename(tmp_path, path)
+
+
+def _is_temporary(name):
+    """write_file의 임시 파일처럼 숨김 파일은 감시 대상에서 제외"""
+    return name.startswith(".")
+
+
+def _load_inotify():
+    """libc의 inotify 함수 로드, 지원하지 않는 환경이면 None"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class DirectoryWatcher:
+    """디렉토리에 새로 기록된 파일을 도착 순서대로 콜백으로 전달 (inotify, 미지원 시 폴링)"""
+
+    def __init__(self, save_dirs, on_file, poll_interval=0.05, use_inotify=True):
+        self.save_dirs = save_dirs  # {카메라 이름: 디렉토리}
+        self.on_file = on_file      # on_file(camera, path, timestamp)
+        self.poll_interval = poll_interval
+        self._libc = _load_inotify() if use_inotify else None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def mode(self):
+        return "inotify" if self._libc is not None else "poll"
+
+    def start(self):
+        watches = self._add_watches() if self._libc is not None else None
+        if watches is None:
+            self._libc = None
+        # 감시 시작 전에 이미 쌓여 있던 파일은 수정 시각 순서로 먼저 전달
+        known = self._emit_existing()
+        if self._libc is not None:
+            # 감시 등록과 초기 스캔 사이에 기록된 파일은 스캔과 이벤트로 두 번 보이므로 known으로 중복 제거
+            target, args = self._run_inotify, (*watches, known)
+        else:
+            target, args = self._run_poll, (known,)
+        self._thread = threading.Thread(target=target, args=args, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _add_watches(self):
+        fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if fd < 0:
+            return None
+        wd_to_camera = {}
+        for camera, save_dir in self.save_dirs.items():
+            wd = self._libc.inotify_add_watch(fd, os.fsencode(save_dir), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                os.close(fd)
+                return None
+            wd_to_camera[wd] = camera
+        return fd, wd_to_camera
+
+    def _list(self):
+        """감시 디렉토리의 (카메라, 항목) 목록"""
+        for camera, save_dir in self.save_dirs.items():
+            with os.scandir(save_dir) as entries:
+                yield from ((camera, entry) for entry in entries)
+
+    def _prune(self, known):
+        """이미 삭제된 파일을 전달한 파일 목록에서 제거"""
+        known.intersection_update(entry.path for _, entry in self._list())
+
+    def _scan(self, known):
+        """known에 없는 파일만 stat 하여 수정 시각 순서로 전달하고 known 갱신"""
+        present = set()
+        new_files = []
+        for camera, entry in self._list():
+            present.add(entry.path)
+            if entry.path in known or _is_temporary(entry.name) or not entry.is_file():
+                continue
+            try:
+                new_files.append((entry.stat().st_mtime, camera, entry.path))
+            except OSError:
+                continue
+        known.intersection_update(present)  # 삭제된 파일은 목록에서 제거
+        for mtime, camera, path in sorted(new_files):
+            known.add(path)
+            self.on_file(camera, path, mtime)
+
+    def _emit_existing(self):
+        known = set()
+        self._scan(known)
+        return known
+
+    def _run_inotify(self, fd, wd_to_camera, known):
+        """known: 이미 전달한 파일 경로 (초기 스캔 결과로 시작, 이벤트로 받은 파일도 추가)"""
+        prune_size = max(PRUNE_SIZE, 2 * len(known))
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select([fd], [], [], 0.5)
+                if not readable:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                now = time()
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    name = data[offset:offset + name_len].rstrip(b"\0")
+                    offset += name_len
+                    if wd == -1 and mask & IN_Q_OVERFLOW:
+                        # 사라진 이벤트의 파일이 디스크에 남지 않도록 디렉토리를 다시 스캔
+                        self._scan(known)
+                        continue
+                    camera = wd_to_camera.get(wd)
+                    name = os.fsdecode(name)
+                    if camera is None or not name or _is_temporary(name):
+                        continue
+                    path = os.path.join(self.save_dirs[camera], name)
+                    if path in known:  # 초기/재스캔에서 이미 전달한 파일
+                        continue
+                    known.add(path)
+                    try:
+                        # 수신기가 기록한 수신 시각 (저장 대기열 지연이 좌/우 간격에 더해지지 않도록)
+                        timestamp = os.stat(path).st_mtime
+                    except OSError:
+                        timestamp = now
+                    self.on_file(camera, path, timestamp)
+                if len(known) > prune_size:
+                    self._prune(known)
+                    prune_size = max(PRUNE_SIZE, 2 * len(known))
+        finally:
+            os.close(fd)
+
+    def _run_poll(self, known):
+        while not self._stop.is_set():
+            sleep(self.poll_interval)
+            self._scan(known)
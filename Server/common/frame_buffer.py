@@ -0,0 +1,122 @@
+import os
+import threading
+from collections import deque, namedtuple
+from datetime import datetime
+from time import time
+
+from file_watcher import write_file
+
+# 카메라 프레임 한 장 (payload: 수신한 JPEG 바이트, path: 디스크에 저장된 파일 경로)
+Frame = namedtuple("Frame", ["camera", "seq", "timestamp", "payload", "path"])
+
+
+def discard_frame(frame):
+    """더 이상 쓰지 않는 프레임 정리 (디스크에서 읽어 온 파일만 삭제, 보관본은 유지)"""
+    if frame.payload is None and frame.path and os.path.exists(frame.path):
+        os.remove(frame.path)
+
+
+def archive_frame(save_dir, payload, received_at=None):
+    """수신한 JPEG 바이트를 파일로 보관 (기존 수신기와 같은 파일 이름 규칙, 수정 시각은 수신 시각)"""
+    os.makedirs(save_dir, exist_ok=True)
+    now = datetime.now() if received_at is None else datetime.fromtimestamp(received_at)
+    image_path = os.path.join(save_dir, f"image_{now.strftime('%d%H%M%S_%f')}.jpg")
+    write_file(image_path, payload, received_at)
+    return image_path
+
+
+# 분석이 수신 속도를 따라가지 못할 때의 처리 방식
+DROP_OLDEST = "drop_oldest"  # 버퍼가 가득 차면 가장 오래된 프레임을 버리고 순서대로 처리
+KEEP_LATEST = "keep_latest"  # 꺼낼 때 카메라별 최신 keep_latest장만 남기고 나머지는 버림
+BLOCK = "block"              # 버퍼에 자리가 날 때까지 수신 측을 대기시킴 (최대 block_timeout초, 이후 가장 오래된 프레임을 버림)
+POLICIES = (DROP_OLDEST, KEEP_LATEST, BLOCK)
+# BLOCK 정책의 기본 최대 대기 시간 (초), 수신 스레드는 여러 기기가 공유하므로 한 기기가 밀려도 다른 기기 수신이 오래 멈추지 않게 짧게 둠
+BLOCK_TIMEOUT = 0.1
+
+
+class FrameRingBuffer:
+    """카메라별 고정 크기 링 버퍼 (MQTT 수신 스레드 → 분석 루프, 디스크 왕복 없음)"""
+
+    def __init__(self, cameras=(), capacity=4, policy=DROP_OLDEST, keep_latest=1,
+                 block_timeout=BLOCK_TIMEOUT, on_drop=discard_frame):
+        if policy not in POLICIES:
+            raise ValueError(f"지원하지 않는 backpressure 정책: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.keep_latest = keep_latest      # KEEP_LATEST 정책에서 남길 최신 프레임 수
+        self.block_timeout = block_timeout  # BLOCK 정책의 최대 대기 시간 (None이면 무한 대기, 같은 수신 스레드의 다른 기기까지 멈춤)
+        self.on_drop = on_drop
+        self._frames = {}
+        self._counters = {}
+        self._cond = threading.Condition()
+        self._seq = 0
+        for camera in cameras:
+            self._add_camera(camera)
+
+    def _add_camera(self, camera):
+        self._frames[camera] = deque()
+        # dropped: 버린 프레임 전체 (페어링/디코딩 실패 포함), overflow: 그중 버퍼가 밀려 버린 프레임
+        self._counters[camera] = {"received": 0, "processed": 0, "dropped": 0, "overflow": 0}
+
+    def put(self, camera, payload=None, path=None, timestamp=None):
+        """프레임 추가, 버퍼가 가득 차면 정책에 따라 대기하거나 가장 오래된 프레임을 버림"""
+        dropped = []
+        with self._cond:
+            if camera not in self._frames:
+                self._add_camera(camera)
+            frames = self._frames[camera]
+            if self.policy == BLOCK:
+                self._cond.wait_for(lambda: len(frames) < self.capacity, self.block_timeout)
+            while len(frames) >= self.capacity:
+                dropped.append(frames.popleft())
+            self._counters[camera]["overflow"] += len(dropped)
+            self._seq += 1
+            frame = Frame(camera, self._seq, time() if timestamp is None else timestamp, payload, path)
+            frames.append(frame)
+            self._counters[camera]["received"] += 1
+            self._cond.notify_all()
+        for old in dropped:
+            self.drop(old)
+        return frame
+
+    def get(self, timeout=None):
+        """도착 순서대로 (모든 카메라 중 가장 먼저 들어온) 프레임 하나를 꺼냄"""
+        dropped = []
+        with self._cond:
+            if not self._cond.wait_for(lambda: any(self._frames.values()), timeout):
+                return None
+            if self.policy == KEEP_LATEST:
+                for camera, frames in self._frames.items():
+                    excess = max(0, len(frames) - self.keep_latest)
+                    dropped.extend(frames.popleft() for _ in range(excess))
+                    self._counters[camera]["overflow"] += excess
+            frames = min((f for f in self._frames.values() if f), key=lambda f: f[0].seq)
+            frame = frames.popleft()
+            self._cond.notify_all()
+        for old in dropped:
+            self.drop(old)
+        return frame
+
+    def drop(self, frame):
+        """처리하지 않고 버리는 프레임 집계 및 정리 (페어링 실패, 디코딩 실패 포함)"""
+        with self._cond:
+            self._counters[frame.camera]["dropped"] += 1
+        if self.on_drop is not None:
+            self.on_drop(frame)
+
+    def mark_processed(self, *frames):
+        with self._cond:
+            for frame in frames:
+                self._counters[frame.camera]["processed"] += 1
+
+    def stats(self):
+        """카메라별 수신/처리/폐기(overflow: 버퍼가 밀려 버린 수) 프레임 수와 현재 대기 중인 프레임 수"""
+        with self._cond:
+            return {
+                camera: dict(counters, queued=len(self._frames[camera]))
+                for camera, counters in self._counters.items()
+            }
+
+    def __len__(self):
+        with self._cond:
+            return sum(len(frames) for frames in self._frames.values())
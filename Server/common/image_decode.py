@@ -0,0 +1,68 @@
+import struct
+import cv2
+import numpy as np
+
+# IMREAD_REDUCED_*: libjpeg가 DCT 단계에서 1/2, 1/4, 1/8 크기로 바로 디코딩
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+# cv2.rotate 코드 → EXIF Orientation 값 (imread/imdecode가 디코딩하면서 회전 적용)
+EXIF_ORIENTATION = {
+    cv2.ROTATE_90_CLOCKWISE: 6,
+    cv2.ROTATE_180: 3,
+    cv2.ROTATE_90_COUNTERCLOCKWISE: 8,
+}
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data):
+    """JPEG 헤더(SOF)에서 (너비, 높이) 읽기, 디코딩하지 않음 (JPEG가 아니면 None)"""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+
+def reduced_flag(size, max_size):
+    """긴 변이 max_size 이상으로 남는 가장 작은 축소 디코딩 플래그"""
+    if size is not None and max_size:
+        for factor, flag in REDUCED_FLAGS:
+            if max(size) / factor >= max_size:
+                return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(data=None, path=None, max_size=None, rotation=None):
+    """JPEG를 추론 해상도에 가깝게 축소 디코딩하고 회전 (data가 없으면 path에서 읽음)
+    (이미지, 원본 대비 배율) 반환, 실패 시 (None, 1.0)"""
+    if data is None:
+        try:
+            data = np.fromfile(path, np.uint8)
+        except OSError:
+            return None, 1.0
+    buffer = np.frombuffer(data, np.uint8)
+    size = jpeg_size(buffer[:65536].tobytes())
+    image = cv2.imdecode(buffer, reduced_flag(size, max_size))
+    if image is None:
+        return None, 1.0
+    if rotation is not None:
+        image = cv2.rotate(image, rotation)
+    scale = max(image.shape[:2]) / max(size) if size is not None else 1.0
+    return image, scale
+
+
+def set_jpeg_rotation(data, rotation):
+    """JPEG 바이트에 EXIF Orientation 태그를 추가하여 재인코딩 없이 회전 정보 기록
+    (cv2.imread/imdecode가 디코딩할 때 회전된 이미지를 반환)"""
+    if data[:2] != b"\xff\xd8":
+        return None
+    # 리틀 엔디언 TIFF 헤더 + Orientation 항목 하나만 가진 IFD0
+    tiff = b"II*\x00" + struct.pack("<IHHHIHHI", 8, 1, 0x0112, 3, 1, EXIF_ORIENTATION[rotation], 0, 0)
+    body = b"Exif\x00\x00" + tiff
+    return data[:2] + b"\xff\xe1" + struct.pack(">H", len(body) + 2) + body + bytes(data[2:])
@@ -0,0 +1,86 @@
+import queue
+import threading
+from time import time
+
+_STOP = object()
+
+
+class IngestQueue:
+    """MQTT 네트워크 스레드에서는 payload만 큐에 넣고, 디코딩/저장은 작업자 스레드에서 실행
+    큐가 가득 차면 가장 오래된 메시지를 버려 네트워크 루프가 멈추지 않게 함
+    handler(topic, payload, received_at)는 작업자 스레드에서 호출"""
+
+    def __init__(self, handler, workers=2, maxsize=64, stats_interval=10, name="receiver"):
+        self.handler = handler
+        self.name = name
+        self.stats_interval = stats_interval
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._received = 0
+        self._handled = 0
+        self._dropped = 0
+        self._failed = 0
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        self._stop = threading.Event()
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        if self.stats_interval:
+            threading.Thread(target=self._report, daemon=True).start()
+        return self
+
+    def put(self, topic, payload):
+        """수신 콜백에서 호출: payload를 복사해 큐에 넣고 바로 반환"""
+        item = (topic, bytes(payload), time())
+        with self._lock:
+            self._received += 1
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    with self._lock:
+                        self._dropped += 1
+                except queue.Empty:
+                    pass
+
+    def stop(self):
+        """남은 메시지를 처리한 뒤 작업자 종료"""
+        self._stop.set()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {"received": self._received, "handled": self._handled, "dropped": self._dropped,
+                    "failed": self._failed, "queued": self._queue.qsize()}
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            try:
+                self.handler(*item)
+                succeeded = True
+            except Exception as e:
+                print(f"[{self.name}] 메시지 처리 중 오류 발생: {e}")
+                succeeded = False
+            with self._lock:
+                if succeeded:
+                    self._handled += 1
+                else:
+                    self._failed += 1
+
+    def _report(self):
+        last = self.stats()
+        while not self._stop.wait(self.stats_interval):
+            current = self.stats()
+            rate = (current["received"] - last["received"]) / self.stats_interval
+            print(f"[{self.name}] 수신 {rate:.1f} msg/s, 대기 {current['queued']}개, 통계: {current}")
+            last = current
@@ -0,0 +1,152 @@
+import json
+import threading
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import time
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+HISTOGRAM_WINDOW = 1024  # 분위수를 계산할 최근 측정값 수
+FPS_WINDOW = 5.0         # FPS를 계산할 최근 시간 범위 (초)
+
+
+class RollingHistogram:
+    """최근 window개 측정값의 분위수 (p50/p95/p99)"""
+
+    def __init__(self, window=HISTOGRAM_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self):
+        if not self.samples:
+            return {q: 0.0 for q in QUANTILES}
+        return dict(zip(QUANTILES, np.quantile(np.fromiter(self.samples, float), QUANTILES).tolist()))
+
+
+class RateMeter:
+    """최근 window초 동안의 초당 처리 수"""
+
+    def __init__(self, window=FPS_WINDOW):
+        self.window = window
+        self.times = deque()
+
+    def mark(self, now):
+        self.times.append(now)
+
+    def rate(self, now):
+        while self.times and self.times[0] < now - self.window:
+            self.times.popleft()
+        return len(self.times) / self.window
+
+
+class PipelineMetrics:
+    """단계별 처리 시간, 수신→전송 지연, 기기별 FPS 집계 (여러 스레드에서 호출 가능)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = defaultdict(RollingHistogram)     # (기기, 단계) → 처리 시간
+        self.end_to_end = defaultdict(RollingHistogram)  # 기기 → 수신부터 전송까지 지연
+        self.fps = defaultdict(RateMeter)                # 기기 → 처리 완료 FPS
+
+    def observe(self, stage, seconds, device="default"):
+        """단계 하나의 처리 시간 기록"""
+        with self._lock:
+            self.stages[(device, stage)].observe(seconds)
+
+    def frame_done(self, received_at, device="default"):
+        """프레임 처리 완료 (received_at: 프레임 수신 시각)"""
+        now = time()
+        with self._lock:
+            self.end_to_end[device].observe(now - received_at)
+            self.fps[device].mark(now)
+
+    def snapshot(self):
+        """현재 집계값: {기기: {"fps", "latency", "stages": {단계: {"count", "p50", ...}}}}"""
+        now = time()
+        result = {}
+        with self._lock:
+            for device, histogram in self.end_to_end.items():
+                result[device] = {
+                    "fps": round(self.fps[device].rate(now), 2),
+                    "latency": _summary(histogram),
+                    "stages": {},
+                }
+            for (device, stage), histogram in self.stages.items():
+                result.setdefault(device, {"fps": 0.0, "latency": None, "stages": {}})
+                result[device]["stages"][stage] = _summary(histogram)
+        return result
+
+    def prometheus(self):
+        """Prometheus 텍스트 형식으로 변환"""
+        lines = [
+            "# TYPE pipeline_stage_seconds summary",
+            "# TYPE pipeline_latency_seconds summary",
+            "# TYPE pipeline_fps gauge",
+        ]
+        now = time()
+        with self._lock:
+            for (device, stage), histogram in sorted(self.stages.items()):
+                lines += _prometheus_summary("pipeline_stage_seconds", histogram,
+                                             f'device="{device}",stage="{stage}"')
+            for device, histogram in sorted(self.end_to_end.items()):
+                lines += _prometheus_summary("pipeline_latency_seconds", histogram, f'device="{device}"')
+                lines.append(f'pipeline_fps{{device="{device}"}} {self.fps[device].rate(now):.3f}')
+        return "\n".join(lines) + "\n"
+
+
+def _summary(histogram):
+    quantiles = histogram.quantiles()
+    return {
+        "count": histogram.count,
+        **{f"p{int(q * 100)}": round(value * 1000, 2) for q, value in quantiles.items()},  # 밀리초
+    }
+
+
+def _prometheus_summary(name, histogram, labels):
+    lines = [f'{name}{{{labels},quantile="{q}"}} {value:.6f}' for q, value in histogram.quantiles().items()]
+    lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def serve_metrics(metrics, port, host="127.0.0.1"):
+    """/metrics 경로로 Prometheus 형식의 집계값을 제공하는 HTTP 서버 시작 (백그라운드 스레드)
+    기본은 로컬에서만 접근 가능, 외부 수집기에 공개하려면 host="0.0.0.0" 지정"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # 요청마다 로그 출력하지 않음
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def publish_metrics(metrics, client, topic, interval, **extra):
+    """interval초마다 집계값을 JSON으로 MQTT 토픽에 전송 (백그라운드 스레드)"""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            client.publish(topic, json.dumps({"time": time(), **extra, "devices": metrics.snapshot()}))
+
+    threading.Thread(target=loop, daemon=True).start()
+    return stop
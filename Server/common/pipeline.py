@@ -0,0 +1,111 @@
+import queue
+import threading
+from time import perf_counter
+
+DROPPED = object()  # 중간 단계에서 처리가 중단된 item 자리 (순서 보장 단계가 기다리지 않도록 전달)
+_STOP = object()
+
+
+class Stage:
+    """파이프라인 단계: func(item)의 반환값을 다음 단계로 넘김 (None을 반환하면 해당 item 처리 중단)
+    ordered=True인 단계는 입력 순서대로 처리하므로 트래커처럼 상태를 가진 단계에 사용 (작업자 1개)"""
+
+    def __init__(self, name, func, workers=1, queue_size=4, ordered=False):
+        if ordered and workers != 1:
+            raise ValueError(f"순서 보장 단계는 작업자 1개만 사용할 수 있습니다: {name}")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size  # 이 단계 앞 대기열 크기 (가득 차면 이전 단계가 대기)
+        self.ordered = ordered
+
+
+class Pipeline:
+    """단계마다 작업자 스레드를 두고 단계 사이를 크기가 제한된 큐로 연결한 스트리밍 파이프라인
+    (JPEG 디코딩, ORB/SGBM 등 GIL을 놓는 작업이 다른 단계의 추론과 겹쳐서 실행됨)
+    metrics(PipelineMetrics)가 있으면 단계별 처리 시간을 device 이름으로 기록"""
+
+    def __init__(self, stages, on_error=None, metrics=None, device="default"):
+        self.stages = stages
+        self.on_error = on_error or self._print_error
+        self.metrics = metrics
+        self.device = device
+        self._queues = [queue.Queue(stage.queue_size) for stage in stages]
+        self._threads = [[] for _ in stages]
+        self._seq = 0
+
+    @staticmethod
+    def _print_error(stage, item, error):
+        print(f"[{stage.name}] 처리 중 오류 발생: {error}")
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,), daemon=True,
+                                          name=f"pipeline-{stage.name}")
+                thread.start()
+                self._threads[index].append(thread)
+        return self
+
+    def submit(self, item):
+        """첫 단계에 item 추가 (대기열이 가득 차면 자리가 날 때까지 대기)"""
+        self._seq += 1
+        self._queues[0].put((self._seq, item))
+
+    def run(self, source):
+        """source(반복 가능한 객체)의 item을 차례로 파이프라인에 넣음, 호출한 스레드에서 실행"""
+        for item in source:
+            self.submit(item)
+
+    def stop(self, timeout=5):
+        """앞 단계부터 차례로 남은 item을 처리한 뒤 작업자 종료
+        단계마다 최대 timeout(초)만 기다리고, 그 안에 끝나지 않은 단계는 로그를 남기고 넘어감 (데몬 스레드)"""
+        for index, threads in enumerate(self._threads):
+            deadline = perf_counter() + timeout
+            try:
+                for _ in threads:
+                    self._queues[index].put(_STOP, timeout=max(0, deadline - perf_counter()))
+            except queue.Full:
+                pass  # 작업자가 멈춰 대기열이 비지 않음
+            for thread in threads:
+                thread.join(max(0, deadline - perf_counter()))
+            alive = sum(thread.is_alive() for thread in threads)
+            if alive:
+                print(f"[{self.stages[index].name}] 작업자 {alive}개가 {timeout}초 안에 종료되지 않았습니다")
+
+    def _forward(self, index, seq, item):
+        if index + 1 < len(self._queues):
+            self._queues[index + 1].put((seq, item))
+
+    def _process(self, index, seq, item):
+        stage = self.stages[index]
+        if item is not DROPPED:
+            start = perf_counter()
+            try:
+                item = stage.func(item)
+            except Exception as e:
+                self.on_error(stage, item, e)
+                item = None
+            if self.metrics is not None:
+                self.metrics.observe(stage.name, perf_counter() - start, self.device)
+            if item is None:
+                item = DROPPED
+        self._forward(index, seq, item)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        inbox = self._queues[index]
+        pending = {}
+        next_seq = 1
+        while True:
+            entry = inbox.get()
+            if entry is _STOP:
+                break
+            seq, item = entry
+            if not stage.ordered:
+                self._process(index, seq, item)
+                continue
+            pending[seq] = item
+            while next_seq in pending:
+                self._process(index, next_seq, pending.pop(next_seq))
+                next_seq += 1
@@ -0,0 +1,80 @@
+from time import monotonic
+
+# 카메라 전송 설정 단계 (낮은 단계 → 높은 단계), quality는 ESP32 JPEG 품질 값 (작을수록 고화질)
+PROFILES = (
+    {"fps": 2, "quality": 20, "framesize": "QVGA"},
+    {"fps": 5, "quality": 15, "framesize": "VGA"},
+    {"fps": 10, "quality": 12, "framesize": "VGA"},
+    {"fps": 15, "quality": 10, "framesize": "VGA"},
+)
+
+
+class RateController:
+    """처리 지연, 대기 프레임, 위험도, 장면 변화를 보고 카메라 전송 설정 단계를 조절
+    - 서버 포화(지연 초과, 대기/폐기 프레임 발생): 한 단계 낮춤 (위험 상황이면 유지)
+    - 고위험/접근 객체: 가장 높은 단계
+    - 정적인 장면: static_level까지 한 단계씩 낮춤
+    - 그 외: default_level로 한 단계씩 복귀"""
+
+    def __init__(self, profiles=PROFILES, default_level=2, static_level=1, latency_target=0.3,
+                 max_backlog=4, static_ratio=0.8, interval=2.0):
+        self.profiles = profiles
+        self.default_level = default_level
+        self.static_level = static_level
+        self.latency_target = latency_target  # 수신→전송 지연 목표 (초)
+        self.max_backlog = max_backlog        # 허용할 대기 프레임/추론 요청 수
+        self.static_ratio = static_ratio      # 추론을 건너뛴 프레임 비율이 이 이상이면 정적인 장면
+        self.interval = interval              # 설정 변경 판단 주기 (초)
+        self.level = default_level
+        self.latency = None                   # 지연 지수 이동 평균
+        self._dropped = 0
+        self._last_update = monotonic()
+        self._sent = False
+        self._reset_window()
+
+    def _reset_window(self):
+        self._frames = 0
+        self._static_frames = 0
+        self._hazard = False
+
+    def observe(self, latency, hazard=False, static=False):
+        """처리를 마친 프레임 하나의 지연(초), 위험 객체 여부, 추론 생략 여부 기록"""
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        self._frames += 1
+        self._static_frames += bool(static)
+        self._hazard = self._hazard or hazard
+
+    def update(self, backlog, dropped):
+        """interval마다 단계를 정하고, 바뀌었으면 카메라에 보낼 설정 반환 (아니면 None)
+        backlog: 현재 대기 중인 프레임/추론 요청 수, dropped: 지금까지 버퍼가 밀려 폐기된 프레임 수"""
+        now = monotonic()
+        if self._sent and now - self._last_update < self.interval:
+            return None
+        self._last_update = now
+
+        saturated = (self.latency is not None and self.latency > self.latency_target) \
+            or backlog > self.max_backlog or dropped > self._dropped
+        static = self._frames > 0 and self._static_frames / self._frames >= self.static_ratio
+        self._dropped = dropped
+
+        level = self.level
+        if saturated:
+            reason = "saturated"
+            if not self._hazard:
+                level = max(0, level - 1)
+        elif self._hazard:
+            reason = "hazard"
+            level = len(self.profiles) - 1
+        elif static:
+            reason = "static"
+            level += (level < self.static_level) - (level > self.static_level)
+        else:
+            reason = "normal"
+            level += (level < self.default_level) - (level > self.default_level)
+        self._reset_window()
+
+        if level == self.level and self._sent:
+            return None
+        self.level = level
+        self._sent = True
+        return {**self.profiles[level], "level": level, "reason": reason}
@@ -0,0 +1,120 @@
+import cv2
+import numpy as np
+
+# 박스가 차지하는 띠 면적이 이 비율을 넘으면 전체 프레임을 한 번에 계산하는 편이 빠름
+FULL_FRAME_RATIO = 0.6
+
+
+def box_bands(boxes, shape, num_disparities, block_size, min_disparity=0):
+    """박스를 덮는 계산 영역 (y0, y1, x0, x1, valid_x0) 목록, y가 겹치는 영역은 하나로 합침
+    x0은 시차 탐색 범위만큼 왼쪽으로 넓히고, 결과는 valid_x0부터만 사용
+    영상 경계에 걸려 SGBM이 요구하는 최소 크기보다 작아지는 영역은 반대쪽으로 넓히며,
+    영상 자체가 그보다 작으면 해당 박스는 제외 (시차 무효)"""
+    h_img, w_img = shape[:2]
+    pad = block_size // 2 + 1
+    search = min_disparity + num_disparities + pad
+    min_width = min_disparity + num_disparities + block_size
+    if w_img < min_width or h_img < block_size:
+        return []
+    rects = []
+    for x1, y1, x2, y2 in boxes:
+        y0, y1_ = max(0, int(y1) - pad), min(h_img, int(y2) + pad)
+        valid_x0, x1_ = max(0, int(x1) - pad), min(w_img, int(x2) + pad)
+        if y1_ > y0 and x1_ > valid_x0:
+            x0 = max(0, valid_x0 - search)
+            x1_ = max(x1_, min(w_img, x0 + min_width))
+            y0 = min(y0, max(0, y1_ - block_size))
+            y1_ = max(y1_, min(h_img, y0 + block_size))
+            rects.append([y0, y1_, x0, x1_, valid_x0])
+    rects.sort()
+
+    bands = []
+    for rect in rects:
+        if bands and rect[0] <= bands[-1][1]:
+            band = bands[-1]
+            band[1] = max(band[1], rect[1])
+            band[2] = min(band[2], rect[2])
+            band[3] = max(band[3], rect[3])
+            band[4] = min(band[4], rect[4])
+        else:
+            bands.append(rect)
+    return [tuple(band) for band in bands]
+
+
+def compute_disparity_raw(stereo, gray_left, gray_right, boxes=None, full_frame_ratio=FULL_FRAME_RATIO):
+    """StereoSGBM 원시 시차(int16, 16배 고정소수점) 계산
+    boxes가 주어지면 박스를 덮는 가로 띠만 계산하고, 나머지 영역은 무효값으로 채움"""
+    if boxes is None or len(boxes) == 0:
+        return stereo.compute(gray_left, gray_right)
+
+    bands = box_bands(boxes, gray_left.shape, stereo.getNumDisparities(), stereo.getBlockSize(),
+                      stereo.getMinDisparity())
+    band_area = sum((y1 - y0) * (x1 - x0) for y0, y1, x0, x1, _ in bands)
+    if band_area > full_frame_ratio * gray_left.size:
+        return stereo.compute(gray_left, gray_right)
+
+    invalid = (stereo.getMinDisparity() - 1) * 16
+    disparity = np.full(gray_left.shape[:2], invalid, dtype=np.int16)
+    for y0, y1, x0, x1, valid_x0 in bands:
+        band = stereo.compute(np.ascontiguousarray(gray_left[y0:y1, x0:x1]),
+                              np.ascontiguousarray(gray_right[y0:y1, x0:x1]))
+        disparity[y0:y1, valid_x0:x1] = band[:, valid_x0 - x0:]
+    return disparity
+
+
+def create_sgbm(num_disparities, block_size=5):
+    """StereoSGBM 생성 (numDisparities는 16의 배수로 올림)"""
+    return cv2.StereoSGBM_create(
+        minDisparity=0,
+        numDisparities=max(16, int(np.ceil(num_disparities / 16)) * 16),
+        blockSize=block_size,
+        P1=8 * 3 * block_size**2,
+        P2=32 * 3 * block_size**2,
+        disp12MaxDiff=1,
+        uniquenessRatio=10,
+        speckleWindowSize=100,
+        speckleRange=32
+    )
+
+
+def box_disparities(raw, boxes, trim=None):
+    """원시 시차(int16)에서 박스별 유효 시차(> 0)의 중앙값 (픽셀 단위, 유효값이 없으면 NaN)
+    trim이 주어지면 양쪽 끝 trim 비율을 버린 절사 평균
+    시차 값의 범위가 작으므로 박스마다 정렬 대신 원시 시차의 히스토그램만 구하고, 통계는 모든 박스를 한 번에 계산"""
+    result = np.full(len(boxes), np.nan)
+    levels = int(raw.max()) if len(boxes) else 0
+    if levels <= 0:
+        return result
+    h_img, w_img = raw.shape[:2]
+    coords = np.asarray(boxes, dtype=float).astype(int)
+    x1, x2 = np.clip(coords[:, 0], 0, w_img - 1), np.clip(coords[:, 2], 0, w_img - 1)
+    y1, y2 = np.clip(coords[:, 1], 0, h_img - 1), np.clip(coords[:, 3], 0, h_img - 1)
+
+    # 음수(무효) 시차는 uint16으로 보면 levels보다 커지므로 1 ~ levels 구간 히스토그램에서 빠짐
+    unsigned = raw.view(np.uint16)
+    hist = np.zeros((len(boxes), levels), dtype=np.int64)
+    for i in range(len(boxes)):
+        if y2[i] > y1[i] and x2[i] > x1[i]:
+            region = unsigned[y1[i]:y2[i], x1[i]:x2[i]]
+            hist[i] = cv2.calcHist([region], [0], None, [levels], [1, levels + 1]).ravel()
+
+    counts = hist.sum(axis=1)
+    valid = counts > 0
+    hist, counts = hist[valid], counts[valid]
+    cdf = np.cumsum(hist, axis=1)
+    if trim is None:
+        # 작은 쪽부터 (n-1)//2번째, n//2번째 값의 평균 (히스토그램 칸 i는 시차 값 i + 1)
+        lo = (cdf <= ((counts - 1) // 2)[:, None]).sum(axis=1) + 1
+        hi = (cdf <= (counts // 2)[:, None]).sum(axis=1) + 1
+        result[valid] = (lo + hi) / 32.0
+    else:
+        # 작은 쪽부터 k개 값의 합 = 값마다 min(빈도, k - 앞선 빈도 합)만큼 더한 값
+        cut = np.minimum((counts * trim).astype(int), (counts - 1) // 2)
+        below = cdf - hist
+        values = np.arange(1, levels + 1)
+
+        def smallest_sum(k):
+            return (np.clip(k[:, None] - below, 0, hist) * values).sum(axis=1)
+
+        result[valid] = (smallest_sum(counts - cut) - smallest_sum(cut)) / (16.0 * (counts - 2 * cut))
+    return result
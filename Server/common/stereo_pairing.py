@@ -0,0 +1,51 @@
+from collections import deque
+
+
+class StereoPairer:
+    """캡처 시각이 가까운 좌/우 프레임끼리 짝지음 (짝을 못 찾은 프레임은 집계 후 폐기)"""
+
+    def __init__(self, left_camera, right_camera, max_skew=0.05, queue_size=8, on_drop=None):
+        self.left_camera = left_camera
+        self.right_camera = right_camera
+        self.max_skew = max_skew      # 짝으로 인정할 최대 시각 차 (초)
+        self.queue_size = queue_size  # 카메라별 대기 프레임 수
+        self.on_drop = on_drop
+        self._queues = {left_camera: deque(), right_camera: deque()}
+        self.paired = 0
+        self.dropped = {left_camera: 0, right_camera: 0}
+
+    def _drop(self, frame):
+        self.dropped[frame.camera] += 1
+        if self.on_drop is not None:
+            self.on_drop(frame)
+
+    def add(self, frame):
+        """프레임을 추가하고 짝이 맞으면 (왼쪽, 오른쪽) 프레임을, 아니면 None 반환"""
+        own = self._queues[frame.camera]
+        other_camera = self.right_camera if frame.camera == self.left_camera else self.left_camera
+        other = self._queues[other_camera]
+
+        # 상대 카메라 큐에서 허용 범위를 벗어난 오래된 프레임은 더 이상 짝이 될 수 없음
+        while other and other[0].timestamp < frame.timestamp - self.max_skew:
+            self._drop(other.popleft())
+
+        best = min(other, key=lambda f: abs(f.timestamp - frame.timestamp), default=None)
+        if best is not None and abs(best.timestamp - frame.timestamp) <= self.max_skew:
+            # 짝보다 먼저 들어온 프레임은 시간 순서상 짝지을 수 없으므로 폐기
+            while other[0] is not best:
+                self._drop(other.popleft())
+            other.popleft()
+            while own:
+                self._drop(own.popleft())
+            self.paired += 1
+            if frame.camera == self.left_camera:
+                return frame, best
+            return best, frame
+
+        own.append(frame)
+        while len(own) > self.queue_size:
+            self._drop(own.popleft())
+        return None
+
+    def stats(self):
+        return {"paired": self.paired, "dropped": dict(self.dropped)}
@@ -1,11 +1,19 @@
 import os
+import sys
 import cv2
 import json
 import numpy as np
-from time import sleep
 from datetime import datetime
-from ultralytics import YOLO
 import paho.mqtt.client as mqtt
+from scipy.optimize import linear_sum_assignment
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from calibration import calibration_path, load_calibration
+from detector import Detector
+from file_watcher import DirectoryWatcher
+from frame_buffer import FrameRingBuffer, discard_frame, KEEP_LATEST
+from pipeline import Pipeline, Stage
+from stereo_pairing import StereoPairer
 
 # 카메라 간 거리 (Baseline, B) - 두 카메라 간 거리 (단위: cm)
 B = 8.6  # cm
@@ -13,6 +21,23 @@ B = 8.6  # cm
 # 카메라 초점 거리 (OV2640 기준, 실험을 통해 조정 가능)
 f = 550  # 임의 값, 실제 측정 필요
 
+# 스테레오 캘리브레이션 (파일이 있으면 좌/우 이미지를 평행화하고 B, f를 캘리브레이션 값으로 사용)
+calibration = load_calibration(calibration_path("default"))
+if calibration is not None:
+    B, f = calibration.baseline, calibration.focal
+
+# 좌/우 객체 매칭 제약
+MAX_Y_DIFF = 30       # 같은 물체로 볼 최대 y 좌표 차이 (에피폴라 제약, 평행화된 경우 더 줄일 수 있음)
+MAX_SIZE_RATIO = 2.0  # 같은 물체로 볼 최대 박스 크기 비율
+INVALID_COST = 1e9    # 매칭 불가능한 쌍의 비용
+
+# 좌/우 프레임 페어링 및 분석 파이프라인 설정
+FRAME_BUFFER_SIZE = 8              # 카메라별 대기 프레임 수
+BACKPRESSURE_POLICY = KEEP_LATEST  # 분석이 밀리면 최신 프레임만 남기고 버림
+MAX_PAIR_SKEW = 0.05               # 한 쌍으로 인정할 최대 저장 시각 차 (초)
+DECODE_WORKERS = 2                 # JPEG 디코딩/평행화 스레드 수
+PIPELINE_QUEUE_SIZE = 2            # 단계 사이 대기열 크기
+
 # MQTT 설정
 BROKER_ADDRESS = "localhost"
 PORT = 1883
@@ -20,6 +45,7 @@ PUB_TOPIC = "esp32cam/processed"
 STATUS_TOPIC = "esp32cam/status"
 SAVE_DIR_0 = "./images_0"  # 오른쪽 시야
 SAVE_DIR_1 = "./images_1"  # 왼쪽 시야
+SAVE_DIRS = {"right": SAVE_DIR_0, "left": SAVE_DIR_1}
 
 os.makedirs(SAVE_DIR_0, exist_ok=True)
 os.makedirs(SAVE_DIR_1, exist_ok=True)
@@ -35,28 +61,21 @@ print("MQTT 연결 완료")
 client.publish(STATUS_TOPIC, "connected")
 print("MQTT 상태 메시지 전송 완료: connected")
 
-# YOLO 모델 로드
-model = YOLO("yolo11m.pt")
+# YOLO 모델 로드 (사용 가능한 가장 빠른 백엔드 자동 선택)
+model = Detector("yolo11m.pt")
 
-def process_image(image_path):
+def extract_objects(image_path, result):
     """
-    YOLO 모델을 이용해 이미지에서 객체 탐지
-    x, y 좌표 중심을 포함한 객체 리스트 반환
+    YOLO 탐지 결과에서 x, y 좌표 중심을 포함한 객체 리스트 생성
     """
-    image = cv2.imread(image_path)
-    if image is None:
-        print(f"이미지를 로드할 수 없습니다: {image_path}")
-        return None
-    
-    results = model(image, verbose=False)
     detected_objects = []
 
     print(f"\n [{image_path}] YOLO 탐지 결과:")
     
-    for result in results[0].boxes:
-        x1, y1, x2, y2 = map(int, result.xyxy[0])
-        conf = result.conf[0].item()
-        cls = int(result.cls[0])
+    for box in result.boxes:
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        conf = box.conf[0].item()
+        cls = int(box.cls[0])
         label = model.names[cls]
         
         center_x = (x1 + x2) // 2  # 중심 x 좌표
@@ -68,7 +87,9 @@ def process_image(image_path):
             "object": label,
             "confidence": round(conf, 2),
             "x": center_x,
-            "y": center_y
+            "y": center_y,
+            "w": x2 - x1,
+            "h": y2 - y1
         })
 
     if not detected_objects:
@@ -76,95 +97,164 @@ def process_image(image_path):
     
     return detected_objects
 
-def match_objects(obj1_list, obj2_list):
+def load_images(img0_path, img1_path):
     """
-    두 개의 이미지에서 감지된 객체 리스트를 비교하여 가장 가까운 매칭을 수행
-    x 좌표 차이(disparity)와 y 좌표 차이(y_diff)를 동시에 고려
+    좌/우 이미지 로드 (캘리브레이션이 있으면 평행화)
+    [오른쪽, 왼쪽] 이미지 리스트 반환 (로드 실패 시 None)
     """
-    matched_pairs = []
-    used_idx = set()  # 이미 매칭된 인덱스를 저장
+    images = [cv2.imread(img0_path), cv2.imread(img1_path)]
+    for image, image_path in zip(images, (img0_path, img1_path)):
+        if image is None:
+            print(f"이미지를 로드할 수 없습니다: {image_path}")
+            return None
 
-    for obj1 in obj1_list:
-        best_match = None
-        min_score = float("inf")
+    if calibration is not None:
+        # 평행화된 좌/우 영상에서는 같은 물체의 y 좌표가 같아짐 (images[0]: 오른쪽, images[1]: 왼쪽)
+        images[1], images[0] = calibration.rectify(images[1], images[0])
+    return images
 
-        for i, obj2 in enumerate(obj2_list):
-            if i in used_idx:  # 이미 매칭된 객체는 제외
-                continue
-            if obj1["object"] != obj2["object"]:  # 같은 종류의 객체만 매칭
-                continue
+def process_images(images, img0_path, img1_path):
+    """
+    좌/우 이미지를 한 번의 batch 추론으로 객체 탐지
+    이미지별 객체 리스트 반환
+    """
+    results = model(images, verbose=False)
+    return extract_objects(img0_path, results[0]), extract_objects(img1_path, results[1])
 
-            disparity = abs(obj1["x"] - obj2["x"])  # x 좌표 차이
-            y_diff = abs(obj1["y"] - obj2["y"])  # y 좌표 차이
+def match_objects(obj1_list, obj2_list):
+    """
+    두 이미지(obj1: 오른쪽, obj2: 왼쪽)에서 감지된 객체를 라벨별 비용 행렬과 최적 할당으로 매칭
+    비용은 x 좌표 차이(disparity) + y 좌표 차이(y_diff) * 0.5
+    y 차이가 MAX_Y_DIFF 이하, 시차가 양수, 박스 크기 비율이 MAX_SIZE_RATIO 이하인 쌍만 매칭
+    (obj1 인덱스 배열, obj2 인덱스 배열, 시차 배열) 반환
+    """
+    labels1 = np.array([obj["object"] for obj in obj1_list])
+    labels2 = np.array([obj["object"] for obj in obj2_list])
+    boxes1 = np.array([[obj["x"], obj["y"], obj["w"], obj["h"]] for obj in obj1_list], dtype=np.float64)
+    boxes2 = np.array([[obj["x"], obj["y"], obj["w"], obj["h"]] for obj in obj2_list], dtype=np.float64)
 
-            # 최적의 매칭을 찾기 위해 가중합 계산 (x 차이를 우선 고려, y 차이는 보정 역할)
-            score = disparity + (y_diff * 0.5)  # y 차이를 50% 가중치로 반영
+    idx1, idx2, disparities = [], [], []
+    for label in np.intersect1d(labels1, labels2):
+        rows = np.flatnonzero(labels1 == label)
+        cols = np.flatnonzero(labels2 == label)
+        b1 = boxes1[rows][:, None, :]
+        b2 = boxes2[cols][None, :, :]
 
-            if score < min_score:
-                min_score = score
-                best_match = (obj1, obj2, disparity)
-                best_idx = i
+        disparity = b2[..., 0] - b1[..., 0]  # 왼쪽 x - 오른쪽 x
+        y_diff = np.abs(b2[..., 1] - b1[..., 1])
+        size_ratio = np.maximum(b1[..., 2] * b1[..., 3], b2[..., 2] * b2[..., 3]) / \
+            np.maximum(np.minimum(b1[..., 2] * b1[..., 3], b2[..., 2] * b2[..., 3]), 1)
+        valid = (disparity > 0) & (y_diff <= MAX_Y_DIFF) & (size_ratio <= MAX_SIZE_RATIO)
 
-        if best_match:
-            matched_pairs.append(best_match)
-            used_idx.add(best_idx)  # 해당 인덱스를 사용했다고 표시
+        # 최적의 매칭을 찾기 위해 가중합 계산 (x 차이를 우선 고려, y 차이는 보정 역할)
+        cost = np.where(valid, disparity + y_diff * 0.5, INVALID_COST)
+        r, c = linear_sum_assignment(cost)
+        ok = valid[r, c]
+        idx1.append(rows[r[ok]])
+        idx2.append(cols[c[ok]])
+        disparities.append(disparity[r[ok], c[ok]])
 
-    return matched_pairs
+    if not idx1:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+    return np.concatenate(idx1), np.concatenate(idx2), np.concatenate(disparities)
 
 def calculate_distance(disparity):
     """
-    거리 계산 공식 적용 (삼각측량)
+    거리 계산 공식 적용 (삼각측량), 시차 배열 전체를 한 번에 계산 (단위: m)
     D = (B * f) / disparity
     """
-    if disparity == 0:
-        return None  # 분모 0 방지
-    return round((B * f) / (disparity * 100), 2)
+    disparity = np.asarray(disparity, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        distance = (B * f) / (disparity * 100)
+    distance[disparity == 0] = np.nan  # 분모 0 방지
+    return np.round(distance, 2)
 
-try:
+def get_frame_pair():
+    """도착 시각이 맞는 (오른쪽, 왼쪽) 이미지 쌍을 차례로 반환"""
     while True:
-        # 오른쪽 시야 이미지
-        image_files_0 = sorted(os.listdir(SAVE_DIR_0), key=lambda f: os.path.getmtime(os.path.join(SAVE_DIR_0, f)), reverse=True)
-        # 왼쪽 시야 이미지
-        image_files_1 = sorted(os.listdir(SAVE_DIR_1), key=lambda f: os.path.getmtime(os.path.join(SAVE_DIR_1, f)), reverse=True)
-
-        if len(image_files_0) > 0 and len(image_files_1) > 0:
-            img0_path = os.path.join(SAVE_DIR_0, image_files_0[0])
-            img1_path = os.path.join(SAVE_DIR_1, image_files_1[0])
-
-            obj0 = process_image(img0_path)
-            obj1 = process_image(img1_path)
-
-            if obj0 and obj1:
-                matched_objects = match_objects(obj0, obj1)
-                distances = []
-
-                for obj0, obj1, disparity in matched_objects:
-                    distance = calculate_distance(disparity)
-                    if distance:
-                        distances.append({
-                            "object": obj0["object"],
-                            "distance_m": distance
-                        })
-
-                if distances:
-                    mqtt_message = json.dumps({
-                        "timestamp": datetime.now().isoformat(),
-                        "distances": distances
-                    })
-
-                    # MQTT로 전송
-                    client.publish(PUB_TOPIC, mqtt_message)
-
-                    # 터미널 출력 포맷 변경
-                    print("MQTT 전송 완료:")
-                    for item in distances:
-                        print(f"  종류: {item['object']}, 거리: {item['distance_m']}m")
-
-            os.remove(img0_path)
-            os.remove(img1_path)
-        sleep(1)
+        frame = frame_buffer.get(timeout=1)
+        if frame is None:
+            continue
+        pair = pairer.add(frame)
+        if pair is not None:
+            frame_left, frame_right = pair
+            yield {"frames": (frame_right, frame_left)}
+
+def decode_stage(job):
+    job["images"] = load_images(*(frame.path for frame in job["frames"]))
+    if job["images"] is None:
+        for frame in job["frames"]:
+            frame_buffer.drop(frame)
+        return None
+    return job
+
+def detect_stage(job):
+    job["objects"] = process_images(job["images"], *(frame.path for frame in job["frames"]))
+    return job
+
+def match_stage(job):
+    obj0, obj1 = job["objects"]
+    distances = []
+
+    if obj0 and obj1:
+        idx0, idx1, disparities = match_objects(obj0, obj1)
+
+        for i, distance in zip(idx0, calculate_distance(disparities)):
+            if np.isfinite(distance) and distance:
+                distances.append({
+                    "object": obj0[i]["object"],
+                    "distance_m": float(distance)
+                })
+
+    job["distances"] = distances
+    return job
+
+def publish_stage(job):
+    distances = job["distances"]
+    if distances:
+        mqtt_message = json.dumps({
+            "timestamp": datetime.now().isoformat(),
+            "distances": distances
+        })
+
+        # MQTT로 전송
+        client.publish(PUB_TOPIC, mqtt_message)
+
+        # 터미널 출력 포맷 변경
+        print("MQTT 전송 완료:")
+        for item in distances:
+            print(f"  종류: {item['object']}, 거리: {item['distance_m']}m")
+
+    frame_buffer.mark_processed(*job["frames"])
+    for frame in job["frames"]:
+        discard_frame(frame)
+
+def on_stage_error(stage, job, error):
+    print(f"{stage.name} 단계 오류: {error}")
+    for frame in job["frames"]:
+        frame_buffer.drop(frame)
+
+# 새 이미지가 기록되면 바로 버퍼에 추가하고 저장 시각이 맞는 좌/우 이미지끼리 페어링
+frame_buffer = FrameRingBuffer(SAVE_DIRS, FRAME_BUFFER_SIZE, policy=BACKPRESSURE_POLICY)
+pairer = StereoPairer("left", "right", MAX_PAIR_SKEW, on_drop=frame_buffer.drop)
+watcher = DirectoryWatcher(
+    SAVE_DIRS, lambda camera, path, timestamp: frame_buffer.put(camera, path=path, timestamp=timestamp)
+).start()
+
+# 디코딩 → 검출 → 매칭/거리 계산 → 전송 단계가 각자의 스레드에서 겹쳐서 실행
+pipeline = Pipeline([
+    Stage("decode", decode_stage, workers=DECODE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE),
+    Stage("detect", detect_stage, queue_size=PIPELINE_QUEUE_SIZE),
+    Stage("match", match_stage, queue_size=PIPELINE_QUEUE_SIZE),
+    Stage("publish", publish_stage, queue_size=PIPELINE_QUEUE_SIZE),
+], on_error=on_stage_error).start()
+
+try:
+    pipeline.run(get_frame_pair())
 except KeyboardInterrupt:
-    print("프로그램 종료")
+    print(f"프로그램 종료 (프레임 통계: {frame_buffer.stats()}, 페어링 통계: {pairer.stats()})")
 finally:
+    watcher.stop()
+    pipeline.stop()
     client.loop_stop()
     client.disconnect()
@@ -1,44 +1,69 @@
 import os
+import sys
 import cv2
 import json
 import numpy as np
-from time import sleep
+from time import time
 from datetime import datetime
 import paho.mqtt.client as mqtt
-from ultralytics import YOLO
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from calibration import calibration_path, load_calibration
+from detector import Detector
+from file_watcher import DirectoryWatcher
+from frame_buffer import FrameRingBuffer, discard_frame, KEEP_LATEST
+from metrics import PipelineMetrics, publish_metrics, serve_metrics
+from pipeline import Pipeline, Stage
+from stereo_depth import box_disparities, compute_disparity_raw, create_sgbm
+from stereo_pairing import StereoPairer
 
 # 카메라 간 거리 (Baseline, B) - 단위: cm
 B = 5  # 예시: 5cm
 # 카메라 초점 거리 (픽셀 단위, 실제 측정 필요)
 f = 500  # 예시 값
 
+# 스테레오 캘리브레이션 (파일이 있으면 좌/우 이미지를 평행화하고 B, f를 캘리브레이션 값으로 사용)
+calibration = load_calibration(calibration_path("default"))
+MIN_DISTANCE = 50  # 탐지할 최소 거리 (cm), 평행화된 경우 이 거리에 맞춰 시차 탐색 범위를 줄임
+if calibration is not None:
+    B, f = calibration.baseline, calibration.focal
+
 # MQTT 설정
 BROKER_ADDRESS = "localhost"
 PORT = 1883
 PUB_TOPIC = "esp32cam/processed"
 STATUS_TOPIC = "esp32cam/status"
+STATS_TOPIC = "esp32cam/stats"  # 단계별 지연/FPS 통계
+STATS_INTERVAL = 10             # 통계 전송 주기 (초)
+METRICS_PORT = 9200             # Prometheus 형식 통계 HTTP 포트 (/metrics), yolo_distance 워커(9100+i)와 겹치지 않게
+METRICS_HOST = "127.0.0.1"      # 통계 HTTP 바인드 주소 (다른 서버의 수집기에 공개하려면 "0.0.0.0")
 
 # 디렉토리 설정
-SAVE_DIR_0 = "./images_0"
-SAVE_DIR_1 = "./images_1"
+SAVE_DIR_0 = "./images_0"  # 오른쪽 카메라
+SAVE_DIR_1 = "./images_1"  # 왼쪽 카메라
+SAVE_DIRS = {"right": SAVE_DIR_0, "left": SAVE_DIR_1}
 os.makedirs(SAVE_DIR_0, exist_ok=True)
 os.makedirs(SAVE_DIR_1, exist_ok=True)
 
-# YOLO 모델 로드
-model = YOLO("yolo11m.pt")
+# 좌/우 프레임 페어링 설정
+FRAME_BUFFER_SIZE = 8  # 카메라별 대기 프레임 수
+BACKPRESSURE_POLICY = KEEP_LATEST  # 분석이 밀리면 최신 프레임만 남기고 버림
+MAX_PAIR_SKEW = 0.05   # 한 쌍으로 인정할 최대 저장 시각 차 (초)
+
+# 분석 파이프라인 설정 (디코딩 → 검출 → 시차 계산 → 위험도 → 전송)
+DECODE_WORKERS = 2       # JPEG 디코딩/평행화 스레드 수
+PIPELINE_QUEUE_SIZE = 2  # 단계 사이 대기열 크기
+
+# YOLO 모델 로드 (사용 가능한 가장 빠른 백엔드 자동 선택)
+model = Detector("yolo11m.pt")
 
 # StereoSGBM 객체 생성
-stereo = cv2.StereoSGBM_create(
-    minDisparity=0,
-    numDisparities=16 * 5,
-    blockSize=5,
-    P1=8 * 3 * 5**2,
-    P2=32 * 3 * 5**2,
-    disp12MaxDiff=1,
-    uniquenessRatio=10,
-    speckleWindowSize=100,
-    speckleRange=32
-)
+NUM_DISPARITIES = calibration.disparity_range(MIN_DISTANCE) if calibration is not None else 16 * 5
+stereo = create_sgbm(NUM_DISPARITIES)
+# 탐지된 박스를 덮는 가로 띠에서만 시차 계산 (박스가 화면 대부분을 덮으면 전체 프레임 계산)
+ROI_DISPARITY = True
+# 박스별 대표 시차: None이면 중앙값, 0~0.5 값이면 양쪽 끝을 그 비율만큼 버린 절사 평균
+DISPARITY_TRIM = None
 
 def connect_mqtt():
     """MQTT 브로커에 연결"""
@@ -53,22 +78,21 @@ def publish_message(client, topic, message):
     client.publish(STATUS_TOPIC, "connected")
     client.publish(topic, json.dumps(message))
 
-def get_latest_images():
-    """디렉토리에서 가장 최신 이미지를 선택"""
-    image_files_0 = sorted(os.listdir(SAVE_DIR_0), key=lambda f: -os.path.getmtime(os.path.join(SAVE_DIR_0, f)))
-    image_files_1 = sorted(os.listdir(SAVE_DIR_1), key=lambda f: -os.path.getmtime(os.path.join(SAVE_DIR_1, f)))
-
-    if not image_files_0 or not image_files_1:
-        return None, None
-
-    return os.path.join(SAVE_DIR_0, image_files_0[0]), os.path.join(SAVE_DIR_1, image_files_1[0])
-
-def delete_images(img0_path, img1_path):
-    """처리 완료된 이미지 삭제"""
-    if os.path.exists(img0_path):
-        os.remove(img0_path)
-    if os.path.exists(img1_path):
-        os.remove(img1_path)
+def get_frame_pair(frame_buffer, pairer):
+    """도착 시각이 맞는 (왼쪽, 오른쪽) 이미지 쌍 선택, 없으면 (None, None)"""
+    while True:
+        frame = frame_buffer.get(timeout=1)
+        if frame is None:
+            return None, None
+        pair = pairer.add(frame)
+        if pair is not None:
+            return pair
+
+def delete_images(frame_buffer, frame_left, frame_right):
+    """처리 완료된 이미지 집계 후 삭제"""
+    frame_buffer.mark_processed(frame_left, frame_right)
+    discard_frame(frame_left)
+    discard_frame(frame_right)
 
 def detect_objects(img):
     """YOLO를 이용한 객체 탐지"""
@@ -86,81 +110,127 @@ def assess_risk(distance):
         return "medium"
     return "low"
 
-def compute_depth_map(img_left, img_right):
-    """스테레오 이미지를 이용하여 깊이 맵을 계산"""
+def compute_raw_disparity(img_left, img_right, boxes=None):
+    """스테레오 이미지의 원시 시차(int16, 16배 고정소수점) 계산 (boxes가 있으면 해당 영역만)"""
     gray_left = cv2.cvtColor(img_left, cv2.COLOR_BGR2GRAY)
     gray_right = cv2.cvtColor(img_right, cv2.COLOR_BGR2GRAY)
-    
-    disparity = stereo.compute(gray_left, gray_right).astype(np.float32) / 16.0
-    disparity[disparity <= 0.0] = np.nan  # 유효하지 않은 값 제거
-    depth_map = (B * f) / disparity
-    return disparity, depth_map
+    return compute_disparity_raw(stereo, gray_left, gray_right, boxes)
 
 def process_images(client):
-    """이미지를 처리하고 MQTT로 결과 전송"""
+    """이미지를 처리하고 MQTT로 결과 전송
+    (디코딩 → 검출 → 시차 계산 → 위험도 → 전송 단계가 각자의 스레드에서 겹쳐서 실행)"""
+    frame_buffer = FrameRingBuffer(SAVE_DIRS, FRAME_BUFFER_SIZE, policy=BACKPRESSURE_POLICY)
+    pairer = StereoPairer("left", "right", MAX_PAIR_SKEW, on_drop=frame_buffer.drop)
+    # 새 이미지가 기록되면 바로 버퍼에 추가 (디렉토리 반복 스캔 없음)
+    watcher = DirectoryWatcher(
+        SAVE_DIRS, lambda camera, path, timestamp: frame_buffer.put(camera, path=path, timestamp=timestamp)
+    ).start()
+    # 단계별 처리 시간과 수신→전송 지연 집계
+    metrics = PipelineMetrics()
     try:
-        while True:
-            img0_path, img1_path = get_latest_images()
-            if img0_path is None or img1_path is None:
-                sleep(1)
-                continue
-
-            img_right = cv2.imread(img0_path)
-            img_left = cv2.imread(img1_path)
-            if img_right is None or img_left is None:
-                sleep(1)
-                continue
+        serve_metrics(metrics, METRICS_PORT, METRICS_HOST)
+    except OSError as e:
+        print(f"통계 HTTP 서버를 시작할 수 없습니다 (포트 {METRICS_PORT}): {e}")
+    publish_metrics(metrics, client, STATS_TOPIC, STATS_INTERVAL)
 
-            detected_objects = detect_objects(img_left)
-            if not detected_objects:
-                delete_images(img0_path, img1_path)
-                sleep(1)
+    def read_pairs():
+        while True:
+            frame_left, frame_right = get_frame_pair(frame_buffer, pairer)
+            if frame_left is not None:
+                # 이미지 저장 후 버퍼/페어링 대기 시간
+                metrics.observe("ingest", time() - min(frame_left.timestamp, frame_right.timestamp))
+                yield {"frames": (frame_left, frame_right)}
+
+    def decode(job):
+        frame_left, frame_right = job["frames"]
+        img_right = cv2.imread(frame_right.path)
+        img_left = cv2.imread(frame_left.path)
+        if img_right is None or img_left is None:
+            frame_buffer.drop(frame_left)
+            frame_buffer.drop(frame_right)
+            return None
+        if calibration is not None:
+            img_left, img_right = calibration.rectify(img_left, img_right)
+        job["images"] = (img_left, img_right)
+        return job
+
+    def detect(job):
+        job["objects"] = detect_objects(job["images"][0])
+        if not job["objects"]:
+            delete_images(frame_buffer, *job["frames"])
+            metrics.frame_done(min(frame.timestamp for frame in job["frames"]))
+            return None
+        return job
+
+    def compute_disparity(job):
+        # 심도 맵 계산
+        boxes = [box.xyxy[0].cpu().numpy() for box in job["objects"]] if ROI_DISPARITY else None
+        job["disparity"] = compute_raw_disparity(*job["images"], boxes)
+        return job
+
+    def assess(job):
+        h_img, w_img = job["images"][0].shape[:2]
+        objects_data = []
+
+        # 너무 작은 박스를 제외하고, 남은 박스의 대표 시차를 원시 시차에서 한 번에 계산
+        objects, boxes = [], []
+        for box in job["objects"]:
+            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+            x1, x2 = max(0, min(x1, w_img - 1)), max(0, min(x2, w_img - 1))
+            y1, y2 = max(0, min(y1, h_img - 1)), max(0, min(y2, h_img - 1))
+            if (x2 - x1) >= 5 and (y2 - y1) >= 5:
+                objects.append(box)
+                boxes.append((x1, y1, x2, y2))
+        disparities = box_disparities(job["disparity"], boxes, DISPARITY_TRIM)
+
+        for box, disp in zip(objects, disparities):
+            if np.isnan(disp):
                 continue
 
-            # 심도 맵 계산
-            disparity, depth_map = compute_depth_map(img_left, img_right)
-            objects_data = []
-
-            for box in detected_objects:
-                coords = box.xyxy[0].cpu().numpy()
-                x1, y1, x2, y2 = map(int, coords)
-                h_img, w_img = img_left.shape[:2]
-                x1, x2 = max(0, min(x1, w_img - 1)), max(0, min(x2, w_img - 1))
-                y1, y2 = max(0, min(y1, h_img - 1)), max(0, min(y2, h_img - 1))
-
-                if (x2 - x1) < 5 or (y2 - y1) < 5:
-                    continue
-
-                region_disp = disparity[y1:y2, x1:x2]
-                valid_disp = region_disp[np.isfinite(region_disp)]
-                if valid_disp.size == 0:
-                    continue
-
-                avg_disp = float(np.mean(valid_disp))
-                distance = (B * f) / avg_disp
-                label = model.names[int(box.cls[0].item())] if hasattr(model, "names") else str(int(box.cls[0].item()))
-                risk_level = assess_risk(distance)
-
-                objects_data.append({
-                    "label": label,
-                    "distance": round(distance, 2),
-                    "risk_level": risk_level
-                })
-
-                print(f"Detected {label}: Distance = {round(distance, 2)} cm, Confidence = {box.conf[0].item()}")
-
-            if objects_data:
-                publish_message(client, PUB_TOPIC, {
-                    "timestamp": datetime.now().isoformat(),
-                    "objects": objects_data
-                })
-
-            delete_images(img0_path, img1_path)
-            sleep(1)
-
+            distance = (B * f) / float(disp)
+            label = model.names[int(box.cls[0].item())] if hasattr(model, "names") else str(int(box.cls[0].item()))
+            risk_level = assess_risk(distance)
+
+            objects_data.append({
+                "label": label,
+                "distance": round(distance, 2),
+                "risk_level": risk_level
+            })
+
+            print(f"Detected {label}: Distance = {round(distance, 2)} cm, Confidence = {box.conf[0].item()}")
+
+        job["objects_data"] = objects_data
+        return job
+
+    def publish(job):
+        if job["objects_data"]:
+            publish_message(client, PUB_TOPIC, {
+                "timestamp": datetime.now().isoformat(),
+                "objects": job["objects_data"]
+            })
+
+        delete_images(frame_buffer, *job["frames"])
+        metrics.frame_done(min(frame.timestamp for frame in job["frames"]))
+
+    def on_error(stage, job, error):
+        print(f"{stage.name} 단계 오류: {error}")
+        for frame in job["frames"]:
+            frame_buffer.drop(frame)
+
+    pipeline = Pipeline([
+        Stage("decode", decode, workers=DECODE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE),
+        Stage("detect", detect, queue_size=PIPELINE_QUEUE_SIZE),
+        Stage("stereo", compute_disparity, queue_size=PIPELINE_QUEUE_SIZE),
+        Stage("risk", assess, queue_size=PIPELINE_QUEUE_SIZE),
+        Stage("publish", publish, queue_size=PIPELINE_QUEUE_SIZE),
+    ], on_error=on_error, metrics=metrics).start()
+    try:
+        pipeline.run(read_pairs())
     except KeyboardInterrupt:
-        print("프로그램 종료")
+        print(f"프로그램 종료 (프레임 통계: {frame_buffer.stats()}, 페어링 통계: {pairer.stats()})")
     finally:
+        watcher.stop()
+        pipeline.stop()
         client.loop_stop()
         client.disconnect()
 
@@ -1,7 +1,12 @@
 import os
+import sys
 import paho.mqtt.client as mqtt
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from file_watcher import write_file
+from ingest_queue import IngestQueue
+
 # MQTT 설정
 BROKER_ADDRESS = "localhost"  # MQTT 브로커 주소
 PORT = 1883                                # MQTT 브로커 포트
@@ -10,27 +15,31 @@ SAVE_DIRS = {
     "esp32/cam_0": "./images_0",
     "esp32/cam_1": "./images_1",
 }
+SAVE_WORKERS = 2        # 이미지 저장 스레드 수
+INGEST_QUEUE_SIZE = 64  # 저장 대기 메시지 수 (가득 차면 오래된 메시지부터 버림)
+STATS_INTERVAL = 10     # 수신 속도/대기 메시지 수 출력 주기 (초)
 
 # 디렉토리 생성
 for directory in SAVE_DIRS.values():
     os.makedirs(directory, exist_ok=True)
 
-# 메시지 수신 콜백 함수
+# 이미지 저장 함수 (저장 스레드에서 실행)
+def save_image(topic, payload, received_at):
+    now = datetime.fromtimestamp(received_at)  # 수신 날짜와 시간으로 이미지 저장
+    save_dir = SAVE_DIRS.get(topic, "./unknown")
+    if save_dir == "./unknown":
+        os.makedirs(save_dir, exist_ok=True)
+    # 파일 이름 생성
+    image_path = os.path.join(save_dir, f"image_{now.strftime('%d%H%M%S_%f')}.jpg")
+    # 메시지 payload를 파일로 저장, 분석 스크립트가 좌/우 이미지를 수정 시각으로 페어링하므로
+    # 저장 지연과 관계없이 수신 시각으로 설정한 뒤 완성된 파일을 한 번에 디렉토리로 옮김
+    write_file(image_path, payload, received_at)
+
+ingest = IngestQueue(save_image, SAVE_WORKERS, INGEST_QUEUE_SIZE, STATS_INTERVAL, "dual_image_receiver").start()
+
+# 메시지 수신 콜백 함수 (네트워크 스레드에서는 큐에 넣기만 함)
 def on_message(client, userdata, msg):
-    print(f"Received message on topic {msg.topic}")
-    print(f"Payload length: {len(msg.payload)} bytes")
-    try:
-        now = datetime.now()  # 현재 날짜와 시간으로 이미지 저장
-        save_dir = SAVE_DIRS.get(msg.topic, "./unknown")
-        if save_dir == "./unknown":
-            os.makedirs(save_dir, exist_ok=True)
-        # 파일 이름 생성
-        image_path = os.path.join(save_dir, f"image_{now.strftime('%d%H%M%S_%f')}.jpg")
-        with open(image_path, "wb") as f:
-            f.write(msg.payload)  # 메시지 payload를 파일로 저장
-        print(f"이미지 저장 완료: {image_path}\n")
-    except Exception as e:
-        print(f"이미지를 저장하는 중 오류 발생: {e}")
+    ingest.put(msg.topic, msg.payload)
 
 # MQTT 연결 콜백 함수
 def on_connect(client, userdata, flags, rc):
@@ -58,3 +67,6 @@ try:
 except KeyboardInterrupt:
     print("\n프로그램 종료")
     client.disconnect()
+finally:
+    ingest.stop()
+    print(f"수신 통계: {ingest.stats()}")
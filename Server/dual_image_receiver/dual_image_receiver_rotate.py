@@ -1,9 +1,14 @@
 import os
+import sys
 import cv2
-import numpy as np
 import paho.mqtt.client as mqtt
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from file_watcher import write_file
+from image_decode import set_jpeg_rotation
+from ingest_queue import IngestQueue
+
 # MQTT 설정
 BROKER_ADDRESS = "localhost"
 PORT = 1883
@@ -12,6 +17,10 @@ SAVE_DIRS = {
     "esp32/cam_0": "./images_0",
     "esp32/cam_1": "./images_1",
 }
+ROTATION = cv2.ROTATE_90_COUNTERCLOCKWISE
+SAVE_WORKERS = 2        # 회전/저장 스레드 수
+INGEST_QUEUE_SIZE = 64  # 저장 대기 메시지 수 (가득 차면 오래된 메시지부터 버림)
+STATS_INTERVAL = 10     # 수신 속도/대기 메시지 수 출력 주기 (초)
 
 def create_directories():
     """이미지 저장 디렉토리 생성"""
@@ -19,16 +28,16 @@ def create_directories():
         os.makedirs(directory, exist_ok=True)
 
 def rotate_image(image_data):
-    """수신된 JPEG 이미지를 90도 반시계 방향으로 회전"""
-    image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
-    if image is None:
-        print("이미지 디코딩 실패!")
-        return None
-    return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    """수신된 JPEG 이미지를 90도 반시계 방향으로 회전
+    (디코딩/재인코딩 없이 EXIF 회전 태그만 추가, 분석 스크립트의 cv2.imread가 회전된 이미지로 읽음)"""
+    rotated = set_jpeg_rotation(image_data, ROTATION)
+    if rotated is None:
+        print("JPEG 형식이 아닌 이미지!")
+    return rotated
 
-def save_image(topic, image_data):
-    """이미지 파일 저장"""
-    now = datetime.now()
+def save_image(topic, image_data, received_at):
+    """이미지 파일 저장 (저장 스레드에서 실행)"""
+    now = datetime.fromtimestamp(received_at)
     save_dir = SAVE_DIRS.get(topic, "./unknown")
     if save_dir == "./unknown":
         os.makedirs(save_dir, exist_ok=True)
@@ -36,19 +45,17 @@ def save_image(topic, image_data):
     rotated_image = rotate_image(image_data)
     if rotated_image is not None:
         image_path = os.path.join(save_dir, f"image_{now.strftime('%d%H%M%S_%f')}.jpg")
-        cv2.imwrite(image_path, rotated_image)
-        print(f"이미지 저장 완료: {image_path}\n")
+        # 분석 스크립트가 좌/우 이미지를 수정 시각으로 페어링하므로 수신 시각으로 설정한 뒤 디렉토리로 옮김
+        write_file(image_path, rotated_image, received_at)
     else:
         print("이미지 저장 실패!")
 
+# 수신 메시지를 회전/저장 스레드로 넘기는 큐
+ingest = IngestQueue(save_image, SAVE_WORKERS, INGEST_QUEUE_SIZE, STATS_INTERVAL, "dual_image_receiver_rotate")
+
 def on_message(client, userdata, msg):
-    """MQTT 메시지를 수신하면 실행되는 콜백 함수"""
-    print(f"Received message on topic {msg.topic}")
-    print(f"Payload length: {len(msg.payload)} bytes")
-    try:
-        save_image(msg.topic, msg.payload)
-    except Exception as e:
-        print(f"이미지를 저장하는 중 오류 발생: {e}")
+    """MQTT 메시지를 수신하면 실행되는 콜백 함수 (네트워크 스레드에서는 큐에 넣기만 함)"""
+    ingest.put(msg.topic, msg.payload)
 
 def on_connect(client, userdata, flags, rc):
     """MQTT 브로커 연결 시 실행되는 콜백 함수"""
@@ -76,8 +83,12 @@ def start_mqtt(client):
     except KeyboardInterrupt:
         print("\n프로그램 종료")
         client.disconnect()
+    finally:
+        ingest.stop()
+        print(f"수신 통계: {ingest.stats()}")
 
 if __name__ == "__main__":
     create_directories()
+    ingest.start()
     mqtt_client = connect_mqtt()
     start_mqtt(mqtt_client)
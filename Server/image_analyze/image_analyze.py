@@ -1,11 +1,16 @@
 import os
-import cv2
+import sys
 import json
-from time import sleep
+import queue
 from datetime import datetime
-from ultralytics import YOLO
 import paho.mqtt.client as mqtt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from detector import Detector
+from file_watcher import DirectoryWatcher
+from image_decode import decode_image
+from pipeline import Pipeline, Stage
+
 # MQTT 설정
 BROKER_ADDRESS = "localhost"
 PORT = 1883
@@ -29,17 +34,26 @@ print("MQTT 연결 완료")
 client.publish(STATUS_TOPIC, "connected")
 print("MQTT 상태 메시지 전송 완료: connected")
 
-# YOLO 모델 로드
-model = YOLO("yolo11n.pt")  # 모델 파일이 올바른 위치에 있는지 확인
+# YOLO 모델 로드 (사용 가능한 가장 빠른 백엔드 자동 선택)
+model = Detector("yolo11n.pt")  # 모델 파일이 올바른 위치에 있는지 확인
+
+# 분석 파이프라인 설정 (디코딩 → 검출 → 전송)
+DECODE_WORKERS = 2       # JPEG 디코딩 스레드 수
+DECODE_MAX_SIZE = 640    # 모델 입력 크기에 가깝게 축소 디코딩 (None이면 원본 크기)
+PIPELINE_QUEUE_SIZE = 2  # 단계 사이 대기열 크기
 
-# 이미지 분석 함수
-def process_image(image_path):
-    image = cv2.imread(image_path)
-    if image is None:
-        print(f"이미지를 로드할 수 없습니다: {image_path}")
+# 이미지 로드 단계
+def load_image(job):
+    job["image"], _ = decode_image(path=job["path"], max_size=DECODE_MAX_SIZE)
+    if job["image"] is None:
+        print(f"이미지를 로드할 수 없습니다: {job['path']}")
+        os.remove(job["path"])
         return None
+    return job
 
-    results = model(image)
+# 이미지 분석 단계
+def process_image(job):
+    results = model(job["image"])
     detected_objects = []
 
     # 결과에서 detection 정보를 추출
@@ -54,29 +68,48 @@ def process_image(image_path):
             "confidence": round(conf, 2)
         })
 
-    return detected_objects
+    job["objects"] = detected_objects
+    return job
+
+# 결과 전송 단계
+def publish_result(job):
+    detected_objects = job["objects"]
+    if detected_objects:
+        mqtt_message = json.dumps({
+            "timestamp": datetime.now().isoformat(),
+            "objects": detected_objects
+        })
+        # 첫 연결 때 연결되지 않았을 경우를 대비 계속 전송
+        client.publish(PUB_TOPIC, mqtt_message)
+        client.publish(STATUS_TOPIC, "connected")
+        print(f"MQTT 전송 완료: {mqtt_message}")
+
+    os.remove(job["path"])
+
+def read_images():
+    """새로 저장된 이미지를 도착 순서대로 반환"""
+    while True:
+        image_path = image_queue.get()
+        if os.path.exists(image_path):
+            yield {"path": image_path}
+
+# 새로 저장된 이미지 경로를 도착 순서대로 받는 큐
+image_queue = queue.Queue()
+watcher = DirectoryWatcher({"cam": SAVE_DIR}, lambda camera, path, timestamp: image_queue.put(path)).start()
+
+pipeline = Pipeline([
+    Stage("decode", load_image, workers=DECODE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE),
+    Stage("detect", process_image, queue_size=PIPELINE_QUEUE_SIZE),
+    Stage("publish", publish_result, queue_size=PIPELINE_QUEUE_SIZE),
+]).start()
 
 # 이미지 수신 및 분석 루프
 try:
-    while True:
-        image_files = [f for f in os.listdir(SAVE_DIR) if os.path.isfile(os.path.join(SAVE_DIR, f))]
-        for image_file in image_files:
-            image_path = os.path.join(SAVE_DIR, image_file)
-            detected_objects = process_image(image_path)
-            if detected_objects:
-                mqtt_message = json.dumps({
-                    "timestamp": datetime.now().isoformat(),
-                    "objects": detected_objects
-                })
-                # 첫 연결 때 연결되지 않았을 경우를 대비 계속 전송
-                client.publish(PUB_TOPIC, mqtt_message)
-                client.publish(STATUS_TOPIC, "connected")
-                print(f"MQTT 전송 완료: {mqtt_message}")
-
-            os.remove(image_path)
-        sleep(1)
+    pipeline.run(read_images())
 except KeyboardInterrupt:
     print("프로그램 종료")
 finally:
+    watcher.stop()
+    pipeline.stop()
     client.loop_stop()
     client.disconnect()
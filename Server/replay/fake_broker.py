@@ -0,0 +1,125 @@
+import queue
+import threading
+from collections import Counter
+from time import time
+
+from paho.mqtt.client import topic_matches_sub
+
+_STOP = object()
+
+
+class FakeMessage:
+    """paho MQTTMessage 중 분석 스크립트가 사용하는 속성만 제공"""
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+
+
+class FakeBroker:
+    """프로세스 내 MQTT 브로커 대역 (구독 토픽이 맞는 클라이언트의 수신 큐로 메시지 전달)"""
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics  # PipelineMetrics: 클라이언트별 수신 대기+콜백 처리 시간 기록
+        self.published = Counter()  # 토픽별 발행 수
+        self._clients = []
+        self._lock = threading.Lock()
+
+    def client_factory(self, *args, **kwargs):
+        """paho.mqtt.client.Client 대신 사용 (인자는 무시)"""
+        return FakeClient(self)
+
+    def attach(self, client):
+        with self._lock:
+            self._clients.append(client)
+
+    def detach(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def publish(self, topic, payload):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        elif payload is None:
+            payload = b""
+        with self._lock:
+            self.published[topic] += 1
+            clients = list(self._clients)
+        for client in clients:
+            if client.is_subscribed(topic):
+                client.deliver(FakeMessage(topic, payload))
+
+    def subscribed(self, topic):
+        """topic을 구독한 클라이언트가 있는지 여부"""
+        with self._lock:
+            return any(client.is_subscribed(topic) for client in self._clients)
+
+    def backlog(self):
+        """클라이언트 수신 큐에 남은 메시지 수"""
+        with self._lock:
+            return sum(client.inbox.qsize() for client in self._clients)
+
+
+class FakeClient:
+    """paho.mqtt.client.Client 대역: 수신 콜백은 클라이언트마다 별도 스레드에서 실행 (paho 네트워크 스레드와 동일)"""
+
+    _count = 0
+
+    def __init__(self, broker):
+        FakeClient._count += 1
+        self.name = f"client{FakeClient._count}"
+        self.broker = broker
+        self.on_connect = None
+        self.on_message = None
+        self.inbox = queue.Queue()
+        self._subscriptions = set()
+        self._thread = None
+
+    def connect(self, host=None, port=None, keepalive=60):
+        self.broker.attach(self)
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+        return 0
+
+    def disconnect(self):
+        self.broker.detach(self)
+        self.inbox.put(_STOP)
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        self._subscriptions.add(topic)
+        return 0, 0
+
+    def is_subscribed(self, topic):
+        return any(topic_matches_sub(sub, topic) for sub in self._subscriptions)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.broker.publish(topic, payload)
+
+    def deliver(self, message):
+        self.inbox.put((time(), message))
+
+    def loop_start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.loop_forever, daemon=True)
+            self._thread.start()
+
+    def loop_stop(self):
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self.inbox.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def loop_forever(self):
+        while True:
+            item = self.inbox.get()
+            if item is _STOP:
+                break
+            queued_at, message = item
+            if self.on_message is not None:
+                self.on_message(self, None, message)
+            if self.broker.metrics is not None:
+                self.broker.metrics.observe("on_message", time() - queued_at, self.name)
@@ -0,0 +1,49 @@
+import threading
+from time import time
+import paho.mqtt.client as mqtt
+
+from segment_file import SegmentWriter
+
+# MQTT 설정
+BROKER_ADDRESS = "localhost"
+PORT = 1883
+# 단일 기기 토픽과 기기별 토픽 모두 기록
+TOPICS = ["esp32/cam_0", "esp32/cam_1", "esp32/+/cam_0", "esp32/+/cam_1"]
+
+# 기록 설정
+RECORD_DIR = "./recordings"
+SEGMENT_MAX_BYTES = 256 * 1024 * 1024  # 세그먼트 파일 하나의 최대 크기
+
+writer = SegmentWriter(RECORD_DIR, SEGMENT_MAX_BYTES)
+lock = threading.Lock()
+
+def on_message(client, userdata, msg):
+    received_at = time()  # 디스크 기록 전에 수신 시각 측정
+    with lock:
+        writer.write(received_at, msg.topic, msg.payload)
+        if writer.count % 100 == 0:
+            print(f"{writer.count}개 메시지 기록")
+
+def on_connect(client, userdata, flags, rc):
+    if rc == 0:
+        print("MQTT 브로커에 연결 성공!")
+        for topic in TOPICS:
+            client.subscribe(topic)
+            print(f"토픽 구독: {topic}")
+    else:
+        print(f"MQTT 브로커에 연결 실패, 코드: {rc}")
+
+client = mqtt.Client()
+client.on_connect = on_connect
+client.on_message = on_message
+client.connect(BROKER_ADDRESS, PORT, 60)
+
+try:
+    print("카메라 스트림 기록 중... (Ctrl+C로 종료)")
+    client.loop_forever()
+except KeyboardInterrupt:
+    print(f"\n기록 종료: {writer.count}개 메시지")
+    client.disconnect()
+finally:
+    with lock:
+        writer.close()
@@ -0,0 +1,127 @@
+import os
+import queue
+import runpy
+import sys
+import threading
+from time import sleep, time
+import paho.mqtt.client as mqtt
+
+from fake_broker import FakeBroker
+from segment_file import read_segments, segment_paths
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(SERVER_DIR, "common"))
+from metrics import PipelineMetrics
+
+# 재생 설정
+RECORD_DIR = "./recordings"   # record_stream.py로 기록한 세그먼트 파일 디렉토리
+SPEED = 1.0                   # 1.0: 실시간, N: N배속, 0: 최대 속도 (대기 없이 연속 전송)
+# 재생 대상: "yolo_distance" 또는 수신기 스크립트 경로 (SERVER_DIR 기준)
+TARGET = "yolo_distance"
+# TARGET = "dual_image_receiver/dual_image_receiver.py"
+DRAIN_TIMEOUT = 30            # 전송 후 남은 프레임 처리를 기다리는 최대 시간 (초)
+CAMERA_TOPIC = "esp32/cam_0"  # 대상이 구독을 마쳤는지 확인할 토픽
+
+def start_yolo_distance(broker, metrics):
+    """yolo_distance의 memory 모드를 워커 프로세스 없이 이 프로세스에서 실행"""
+    sys.path.append(os.path.join(SERVER_DIR, "YOLO_Distance"))
+    import yolo_distance
+
+    yolo_distance.start_metrics = lambda client, worker_index=0: metrics  # HTTP 포트 없이 집계만 사용
+    inbox = queue.Queue()
+    worker = threading.Thread(target=yolo_distance.worker_main, args=(0, inbox), daemon=True)
+    worker.start()
+    while yolo_distance.scheduler is None:
+        sleep(0.1)  # 모델 로드가 끝난 뒤 재생 시작
+    router = yolo_distance.connect_mqtt(
+        lambda device_id, camera, payload: inbox.put((device_id, camera, payload, time()))
+    )
+
+    def stop():
+        router.loop_stop()
+        router.disconnect()
+        inbox.put(None)
+        worker.join()
+    return stop
+
+def start_script(broker, path):
+    """수신기 스크립트를 가짜 브로커에 연결된 상태로 실행"""
+    thread = threading.Thread(target=runpy.run_path, args=(os.path.join(SERVER_DIR, path),),
+                              kwargs={"run_name": "__main__"}, daemon=True)
+    thread.start()
+    return lambda: None
+
+def processed_count(metrics):
+    """처리 완료 수: 분석기는 전송까지 끝난 프레임 쌍, 수신기는 콜백이 끝난 메시지"""
+    snapshot = metrics.snapshot()
+    pairs = sum(device["latency"]["count"] for device in snapshot.values() if device["latency"])
+    if pairs:
+        return pairs
+    return sum(device["stages"].get("on_message", {}).get("count", 0) for device in snapshot.values())
+
+def wait_for_drain(broker, metrics):
+    """수신 큐가 비고 처리 수가 1초 동안 변하지 않을 때까지 대기"""
+    deadline = time() + DRAIN_TIMEOUT
+    last = -1
+    while time() < deadline:
+        count = processed_count(metrics)
+        if broker.backlog() == 0 and count == last:
+            return
+        last = count
+        sleep(1)
+    print(f"남은 프레임 처리 대기 시간 초과 ({DRAIN_TIMEOUT}초)")
+
+def print_report(sent, elapsed, total, metrics):
+    """elapsed: 전송에 걸린 시간, total: 남은 프레임 처리까지 걸린 시간"""
+    print(f"\n전송: {sent}개 메시지 / {elapsed:.2f}초 ({sent / elapsed:.1f} msg/s), 처리 완료까지 {total:.2f}초")
+    for device, stats in sorted(metrics.snapshot().items()):
+        print(f"[{device}]")
+        if stats["latency"]:
+            latency = stats["latency"]
+            processed = latency["count"]
+            print(f"  처리: {processed}쌍 ({processed / total:.1f} 쌍/s), "
+                  f"수신→전송 지연 p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms")
+        for stage, summary in stats["stages"].items():
+            print(f"  {stage:>10}: {summary['count']}회, p50={summary['p50']}ms p95={summary['p95']}ms p99={summary['p99']}ms")
+    processed = processed_count(metrics)
+    # 분석기는 좌/우 두 메시지가 한 쌍으로 처리됨
+    dropped = sent - (processed * 2 if TARGET == "yolo_distance" else processed)
+    print(f"폐기(미처리) 메시지: {dropped}개")
+
+def main():
+    paths = segment_paths(RECORD_DIR)
+    if not paths:
+        print(f"세그먼트 파일이 없습니다: {RECORD_DIR}")
+        return
+
+    metrics = PipelineMetrics()
+    broker = FakeBroker(metrics)
+    mqtt.Client = broker.client_factory  # 대상 스크립트의 MQTT 연결을 가짜 브로커로 대체
+    publisher = broker.client_factory()
+    publisher.connect()
+
+    if TARGET == "yolo_distance":
+        stop = start_yolo_distance(broker, metrics)
+    else:
+        stop = start_script(broker, TARGET)
+    while not broker.subscribed(CAMERA_TOPIC):
+        sleep(0.1)
+
+    print(f"재생 시작: {len(paths)}개 세그먼트, 속도 {'최대' if SPEED <= 0 else f'{SPEED}배'}")
+    sent = 0
+    start = time()
+    for timestamp, topic, payload in read_segments(paths):
+        if SPEED > 0:
+            delay = start + timestamp / SPEED - time()
+            if delay > 0:
+                sleep(delay)
+        publisher.publish(topic, payload)
+        sent += 1
+    elapsed = time() - start
+
+    wait_for_drain(broker, metrics)
+    print_report(sent, elapsed, time() - start, metrics)
+    stop()
+
+if __name__ == "__main__":
+    main()
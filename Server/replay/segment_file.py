@@ -0,0 +1,69 @@
+import os
+import struct
+from datetime import datetime
+
+MAGIC = b"TKSEG1\n"
+# 레코드: 수신 시각(첫 레코드 기준 초, float64), 토픽 길이(uint16), payload 길이(uint32) 뒤에 토픽, payload
+RECORD = struct.Struct("<dHI")
+
+
+class SegmentWriter:
+    """MQTT 메시지를 수신 시각과 함께 세그먼트 파일에 기록 (max_bytes를 넘으면 다음 파일로 넘어감)"""
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.start = None
+        self.count = 0
+        self._file = None
+        self._index = 0
+        self._name = datetime.now().strftime("capture_%Y%m%d_%H%M%S")
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f"{self._name}_{self._index:03d}.seg")
+        self._index += 1
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        print(f"세그먼트 파일 기록 시작: {path}")
+
+    def write(self, timestamp, topic, payload):
+        if self.start is None:
+            self.start = timestamp
+        if self._file is None or self._file.tell() >= self.max_bytes:
+            self._open_next()
+        topic = topic.encode()
+        self._file.write(RECORD.pack(timestamp - self.start, len(topic), len(payload)))
+        self._file.write(topic)
+        self._file.write(payload)
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def segment_paths(directory):
+    """디렉토리의 세그먼트 파일을 기록 순서대로 반환"""
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".seg"))
+
+
+def read_segments(paths):
+    """세그먼트 파일들의 (수신 시각, 토픽, payload)를 차례로 반환"""
+    for path in paths:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"세그먼트 파일 형식이 아닙니다: {path}")
+            while True:
+                header = f.read(RECORD.size)
+                if len(header) < RECORD.size:
+                    break  # 기록 중 종료된 마지막 레코드는 무시
+                timestamp, topic_len, payload_len = RECORD.unpack(header)
+                topic = f.read(topic_len)
+                payload = f.read(payload_len)
+                if len(payload) < payload_len:
+                    break
+                yield timestamp, topic.decode(), payload
@@ -0,0 +1,73 @@
+import os
+import sys
+import cv2
+import json
+import glob
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from calibration import calibration_path
+
+# 체스보드 촬영 이미지 (같은 이름의 좌/우 이미지가 한 쌍)
+LEFT_DIR = "./calib_left"    # 왼쪽 카메라 (esp32/cam_1)
+RIGHT_DIR = "./calib_right"  # 오른쪽 카메라 (esp32/cam_0)
+DEVICE_ID = "default"        # 캘리브레이션 대상 기기 ID
+OUTPUT_DIR = "./calibration"  # 결과 파일을 분석 스크립트 실행 위치의 ./calibration에 두고 사용
+
+# 체스보드 설정
+BOARD_SIZE = (9, 6)  # 내부 코너 수 (가로, 세로)
+SQUARE_SIZE = 2.5    # 칸 한 변 길이 (cm), 결과 T의 단위가 됨
+
+def find_corners(image_path):
+    gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None, None
+    found, corners = cv2.findChessboardCorners(gray, BOARD_SIZE)
+    if not found:
+        return gray.shape[::-1], None
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    return gray.shape[::-1], cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
+
+def calibrate():
+    """좌/우 체스보드 이미지로 스테레오 캘리브레이션 후 기기별 JSON 파일로 저장"""
+    board = np.zeros((BOARD_SIZE[0] * BOARD_SIZE[1], 3), np.float32)
+    board[:, :2] = np.mgrid[0:BOARD_SIZE[0], 0:BOARD_SIZE[1]].T.reshape(-1, 2) * SQUARE_SIZE
+
+    object_points, left_points, right_points = [], [], []
+    image_size = None
+    for left_path in sorted(glob.glob(os.path.join(LEFT_DIR, "*.jpg"))):
+        right_path = os.path.join(RIGHT_DIR, os.path.basename(left_path))
+        size, corners_left = find_corners(left_path)
+        _, corners_right = find_corners(right_path)
+        if corners_left is None or corners_right is None:
+            print(f"체스보드를 찾지 못함: {os.path.basename(left_path)}")
+            continue
+        image_size = size
+        object_points.append(board)
+        left_points.append(corners_left)
+        right_points.append(corners_right)
+
+    if len(object_points) < 5:
+        print(f"사용 가능한 이미지 쌍이 부족합니다: {len(object_points)}쌍")
+        return
+
+    _, K1, D1, _, _ = cv2.calibrateCamera(object_points, left_points, image_size, None, None)
+    _, K2, D2, _, _ = cv2.calibrateCamera(object_points, right_points, image_size, None, None)
+    error, K1, D1, K2, D2, R, T, _, _ = cv2.stereoCalibrate(
+        object_points, left_points, right_points, K1, D1, K2, D2, image_size,
+        flags=cv2.CALIB_FIX_INTRINSIC
+    )
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_path = calibration_path(DEVICE_ID, OUTPUT_DIR)
+    with open(output_path, "w") as file:
+        json.dump({
+            "image_size": list(image_size),
+            "K1": K1.tolist(), "D1": D1.tolist(),
+            "K2": K2.tolist(), "D2": D2.tolist(),
+            "R": R.tolist(), "T": T.ravel().tolist()
+        }, file, indent=2)
+    print(f"캘리브레이션 완료 (재투영 오차 {error:.3f}px, 기준선 {np.linalg.norm(T):.2f}cm): {output_path}")
+
+if __name__ == "__main__":
+    calibrate()
@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+from time import sleep, time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from file_watcher import _EVENT_HEADER, IN_MOVED_TO, IN_Q_OVERFLOW, DirectoryWatcher, write_file
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watcher_reports_receive_time_and_skips_temp_files(tmp_path, use_inotify):
+    save_dirs = {"left": str(tmp_path / "left"), "right": str(tmp_path / "right")}
+    for directory in save_dirs.values():
+        os.makedirs(directory)
+    seen = []
+    arrived = threading.Event()
+
+    def on_file(camera, path, timestamp):
+        seen.append((camera, os.path.basename(path), timestamp))
+        if len(seen) == 2:
+            arrived.set()
+
+    watcher = DirectoryWatcher(save_dirs, on_file, use_inotify=use_inotify).start()
+    try:
+        received_at = time() - 5.0  # 저장 대기열에서 5초 늦게 기록된 프레임
+        write_file(os.path.join(save_dirs["left"], "image_1.jpg"), b"left", received_at)
+        write_file(os.path.join(save_dirs["right"], "image_2.jpg"), b"right", received_at + 0.01)
+        assert arrived.wait(2)
+    finally:
+        watcher.stop()
+
+    assert [(camera, name) for camera, name, _ in seen] == [("left", "image_1.jpg"), ("right", "image_2.jpg")]
+    assert seen[0][2] == pytest.approx(received_at, abs=1e-3)
+    assert seen[1][2] - seen[0][2] == pytest.approx(0.01, abs=1e-3)
+    assert not any(name.startswith(".") for directory in save_dirs.values() for name in os.listdir(directory))
+
+
+def test_file_written_during_startup_scan_is_delivered_once(tmp_path, monkeypatch):
+    save_dir = str(tmp_path / "left")
+    os.makedirs(save_dir)
+    seen = []
+    emit_existing = DirectoryWatcher._emit_existing
+
+    def emit_with_race(self):
+        # 감시 등록 후, 초기 스캔 전에 도착한 파일 (스캔과 IN_MOVED_TO 이벤트 양쪽에서 보임)
+        write_file(os.path.join(save_dir, "image_1.jpg"), b"left")
+        return emit_existing(self)
+
+    monkeypatch.setattr(DirectoryWatcher, "_emit_existing", emit_with_race)
+    watcher = DirectoryWatcher({"left": save_dir}, lambda camera, path, timestamp: seen.append(path)).start()
+    assert watcher.mode == "inotify"
+    try:
+        write_file(os.path.join(save_dir, "image_2.jpg"), b"left")
+        deadline = time() + 2
+        while len(seen) < 2 and time() < deadline:
+            sleep(0.01)
+        sleep(0.2)  # 중복 이벤트가 있다면 전달될 시간
+    finally:
+        watcher.stop()
+    assert [os.path.basename(path) for path in seen] == ["image_1.jpg", "image_2.jpg"]
+
+
+def test_queue_overflow_rescans_directory(tmp_path):
+    save_dir = str(tmp_path / "left")
+    os.makedirs(save_dir)
+    seen = []
+    watcher = DirectoryWatcher({"left": save_dir}, lambda camera, path, timestamp: seen.append(path),
+                               use_inotify=False)
+    write_file(os.path.join(save_dir, "image_1.jpg"), b"left", 100.0)
+    write_file(os.path.join(save_dir, "image_2.jpg"), b"left", 101.0)
+    known = {os.path.join(save_dir, "image_1.jpg")}  # 이미 전달한 파일
+
+    read_fd, write_fd = os.pipe()
+    name = b"image_1.jpg\0"
+    os.write(write_fd, _EVENT_HEADER.pack(-1, IN_Q_OVERFLOW, 0, 0)
+             + _EVENT_HEADER.pack(1, IN_MOVED_TO, 0, len(name)) + name)
+    os.close(write_fd)
+    thread = threading.Thread(target=watcher._run_inotify, args=(read_fd, {1: "left"}, known))
+    thread.start()
+    sleep(0.3)
+    watcher.stop()
+    thread.join(1)
+
+    assert [os.path.basename(path) for path in seen] == ["image_2.jpg"]
@@ -0,0 +1,61 @@
+import os
+import sys
+from time import perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from frame_buffer import BLOCK, DROP_OLDEST, KEEP_LATEST, FrameRingBuffer, archive_frame
+from stereo_pairing import StereoPairer
+
+
+def test_overflow_counts_only_backpressure_drops():
+    buffer = FrameRingBuffer(["left", "right"], capacity=2, policy=DROP_OLDEST, on_drop=None)
+    for _ in range(5):
+        buffer.put("left")
+    frame = buffer.put("right")
+    buffer.drop(frame)  # 페어링/디코딩 실패처럼 직접 버린 프레임
+
+    stats = buffer.stats()
+    assert stats["left"]["overflow"] == 3 and stats["left"]["dropped"] == 3
+    assert stats["right"]["overflow"] == 0 and stats["right"]["dropped"] == 1
+
+
+def test_keep_latest_overflow():
+    buffer = FrameRingBuffer(["left", "right"], capacity=8, policy=KEEP_LATEST, keep_latest=1, on_drop=None)
+    for _ in range(3):
+        buffer.put("left")
+    buffer.put("right")
+    buffer.get()
+
+    stats = buffer.stats()
+    assert stats["left"]["overflow"] == 2
+    assert stats["right"]["overflow"] == 0
+
+
+def test_block_waits_at_most_block_timeout():
+    buffer = FrameRingBuffer(["left"], capacity=1, policy=BLOCK, on_drop=None)
+    buffer.put("left")
+    start = perf_counter()
+    buffer.put("left")  # 분석 루프가 꺼내지 않아도 수신 스레드가 계속 진행
+    assert perf_counter() - start < 1
+    assert buffer.stats()["left"]["overflow"] == 1
+
+
+def test_pairing_drops_are_not_overflow():
+    buffer = FrameRingBuffer(["left", "right"], capacity=8, on_drop=None)
+    pairer = StereoPairer("left", "right", 0.05, on_drop=buffer.drop)
+    buffer.put("left", timestamp=0.0)
+    buffer.put("left", timestamp=1.0)
+    buffer.put("right", timestamp=1.01)
+    pairs = [pairer.add(buffer.get(timeout=0)) for _ in range(3)]
+
+    assert pairs[-1] is not None
+    stats = buffer.stats()
+    assert stats["left"]["dropped"] == 1
+    assert sum(camera["overflow"] for camera in stats.values()) == 0
+
+
+def test_archive_frame_uses_received_time(tmp_path):
+    received_at = 1760000000.25
+    path = archive_frame(str(tmp_path / "images_0"), b"jpeg", received_at)
+    assert os.path.getmtime(path) == received_at  # 수신기 파일처럼 수정 시각으로 좌/우 페어링
+    assert os.listdir(tmp_path / "images_0") == [os.path.basename(path)]  # 임시 파일이 남지 않음
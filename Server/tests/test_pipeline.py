@@ -0,0 +1,30 @@
+import os
+import sys
+import threading
+from time import perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from pipeline import Pipeline, Stage
+
+
+def test_stop_drains_remaining_items():
+    results = []
+    pipeline = Pipeline([Stage("double", lambda x: x * 2, workers=2),
+                         Stage("collect", results.append, ordered=True)]).start()
+    pipeline.run(range(10))
+    pipeline.stop()
+    assert results == [x * 2 for x in range(10)]
+
+
+def test_stop_gives_up_on_stuck_stage(capsys):
+    release = threading.Event()
+    pipeline = Pipeline([Stage("stuck", lambda x: release.wait(), queue_size=1)]).start()
+    pipeline.run(range(2))  # 작업자 1개가 멈추고 대기열도 가득 참
+
+    start = perf_counter()
+    pipeline.stop(timeout=0.2)
+    elapsed = perf_counter() - start
+    release.set()
+
+    assert elapsed < 1
+    assert "[stuck] 작업자 1개가 0.2초 안에 종료되지 않았습니다" in capsys.readouterr().out
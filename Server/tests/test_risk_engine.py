@@ -0,0 +1,170 @@
+"""RiskEngine이 기존 객체별 위험도 규칙(get_proximity, 중앙 영역 강화, 직전 프레임 대비 1.2배 접근, 한 단계 상향)과
+같은 결과를 내는지 기록된 프레임 시퀀스(fixtures/risk_golden.json)로 확인
+기록 파일은 `python tests/test_risk_engine.py`로 다시 만들 수 있음 (기존 규칙으로 기대값 계산)"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(TESTS_DIR, "..", "YOLO_Distance"))
+from risk_engine import PROXIMITY_LEVELS, RISK_LEVELS, RiskEngine
+from track_history import TrackHistory
+
+FIXTURE = os.path.join(TESTS_DIR, "fixtures", "risk_golden.json")
+APPROACH_WINDOW = 2  # 직전 프레임과만 비교하는 기존 방식
+
+
+def legacy_assess(frame, names, proximity_thresholds, previous_areas):
+    """yolo_distance의 기존 객체별 위험도 판단 (RiskEngine 도입 전 코드와 같은 규칙)"""
+
+    def get_proximity(label, area):
+        thresholds = proximity_thresholds.get(label.lower(), proximity_thresholds["default"])
+        if area > thresholds[2]:
+            return "very_close"
+        elif area > thresholds[1]:
+            return "close"
+        elif area > thresholds[0]:
+            return "medium"
+        else:
+            return "far"
+
+    results = []
+    for obj in frame["objects"]:
+        coords = np.array(obj["box"], dtype=np.float32)
+        x1, y1, x2, y2 = coords
+        area = float((x2 - x1) * (y2 - y1)) / frame["area_scale"]
+        label = names[obj["cls"]]
+
+        center_region_left = int(coords[2]) > frame["width"] * 0.6
+        both_center = center_region_left and obj["matched"]
+        proximity = get_proximity(label, area)
+
+        if proximity in ["very_close"] or (proximity in ["close"] and both_center):
+            risk_level = "high"
+        elif proximity in ["close"] or (proximity in ["medium"] and both_center):
+            risk_level = "medium"
+        else:
+            risk_level = "low"
+
+        approaching = False
+        track_id = obj["id"]
+        if track_id in previous_areas:
+            if area > previous_areas[track_id] * 1.2:
+                approaching = True
+        previous_areas[track_id] = area
+
+        if approaching:
+            risk_levels = ["low", "medium", "high"]
+            current_index = risk_levels.index(risk_level)
+            if current_index < len(risk_levels) - 1:
+                risk_level = risk_levels[current_index + 1]
+
+        results.append({"proximity": proximity, "risk_level": risk_level, "approaching": approaching})
+    return results
+
+
+def load_fixture():
+    with open(FIXTURE, encoding="utf-8") as f:
+        fixture = json.load(f)
+    fixture["names"] = {int(k): v for k, v in fixture["names"].items()}
+    return fixture
+
+
+def engine_assess(fixture, distances=None):
+    """yolo_distance의 risk 단계와 같은 순서로 RiskEngine/TrackHistory 호출"""
+    engine = RiskEngine(fixture["names"], fixture["proximity_thresholds"])
+    history = TrackHistory(length=APPROACH_WINDOW)
+    for frame in fixture["frames"]:
+        objects = frame["objects"]
+        track_ids = [obj["id"] for obj in objects]
+        boxes = np.array([obj["box"] for obj in objects], dtype=np.float32).reshape(-1, 4)
+        areas = engine.box_areas(boxes, frame["area_scale"])
+        history.append(track_ids, areas)
+        proximity, risk, approaching = engine.evaluate(
+            areas, [obj["cls"] for obj in objects], boxes[:, 2], [obj["matched"] for obj in objects],
+            history.growth(track_ids), frame["width"], None if distances is None else distances(len(objects)))
+        history.remove(frame["dropped_ids"])
+        yield [
+            {"proximity": PROXIMITY_LEVELS[p], "risk_level": RISK_LEVELS[r], "approaching": bool(a)}
+            for p, r, a in zip(proximity, risk, approaching)
+        ]
+
+
+def test_fixture_matches_legacy_rules():
+    fixture = load_fixture()
+    previous_areas = {}
+    for frame in fixture["frames"]:
+        assert legacy_assess(frame, fixture["names"], fixture["proximity_thresholds"], previous_areas) \
+            == frame["expected"]
+
+
+@pytest.mark.parametrize("distances", [None, lambda n: np.full(n, np.nan)])
+def test_risk_engine_matches_golden(distances):
+    fixture = load_fixture()
+    mismatches = [
+        (frame["index"], k, got, want)
+        for frame, results in zip(fixture["frames"], engine_assess(fixture, distances))
+        for k, (got, want) in enumerate(zip(results, frame["expected"]))
+        if got != want
+    ]
+    assert not mismatches, mismatches[:5]
+    assert sum(len(frame["objects"]) for frame in fixture["frames"]) > 500
+
+
+def test_golden_covers_every_rule():
+    expected = [obj for frame in load_fixture()["frames"] for obj in frame["expected"]]
+    assert {obj["proximity"] for obj in expected} == set(PROXIMITY_LEVELS)
+    assert {obj["risk_level"] for obj in expected} == set(RISK_LEVELS)
+    assert any(obj["approaching"] for obj in expected)
+
+
+def record_fixture(num_frames=120, seed=7):
+    """검출/추적 결과를 흉내 낸 프레임 시퀀스를 만들고 기존 규칙의 결과를 기대값으로 기록"""
+    rng = np.random.default_rng(seed)
+    names = {0: "person", 1: "car", 2: "bollard", 3: "Pillar", 4: "unknown"}
+    proximity_thresholds = {
+        "person": [2000, 4000, 6000],
+        "car": [5000, 10000, 15000],
+        "bollard": [1000, 2000, 2500],
+        "pillar": [3000, 6000, 9000],
+        "default": [2000, 3000, 4000],
+    }
+    width = 640
+    tracks, next_id, frames, previous_areas = {}, 1, [], {}
+    for index in range(num_frames):
+        area_scale = 1.0 if index < num_frames // 2 else 4.0  # 뒤 절반은 1/2 축소 디코딩
+        dropped_ids = []
+        for track_id in list(tracks):
+            if rng.random() < 0.05:
+                dropped_ids.append(track_id)
+                del tracks[track_id]
+        while len(tracks) < 8 and rng.random() < 0.6:
+            w, h = rng.uniform(10, 120, 2)
+            tracks[next_id] = {"cls": int(rng.integers(len(names))), "x": rng.uniform(0, width - w),
+                               "y": rng.uniform(0, 400), "w": w, "h": h}
+            next_id += 1
+
+        objects = []
+        for track_id, track in tracks.items():
+            growth = rng.choice([1.0, 1.05, 1.15, 1.3, 0.9])  # 일부 트랙은 빠르게 커짐 (접근)
+            track["w"] = min(track["w"] * np.sqrt(growth), 400)
+            track["h"] = min(track["h"] * np.sqrt(growth), 400)
+            x1, y1 = track["x"], track["y"]
+            box = np.array([x1, y1, x1 + track["w"], y1 + track["h"]], dtype=np.float32) / np.sqrt(area_scale)
+            objects.append({"id": track_id, "cls": track["cls"], "box": [float(v) for v in box],
+                            "matched": bool(rng.random() < 0.5)})
+
+        frame = {"index": index, "width": width / np.sqrt(area_scale), "area_scale": area_scale,
+                 "objects": objects, "dropped_ids": dropped_ids}
+        frame["expected"] = legacy_assess(frame, names, proximity_thresholds, previous_areas)
+        frames.append(frame)
+
+    with open(FIXTURE, "w", encoding="utf-8") as f:
+        json.dump({"names": names, "proximity_thresholds": proximity_thresholds, "frames": frames}, f)
+
+
+if __name__ == "__main__":
+    record_fixture()
@@ -0,0 +1,93 @@
+"""배열 기반 Sort가 기존 filterpy 기반 트래커와 같은 트랙 ID/박스를 내는지 기록된 detection 시퀀스
+(fixtures/sort_golden.json)로 확인
+기록 파일은 기존 구현의 sort.py 경로를 넘겨 다시 만들 수 있음:
+    git show 06e9215~1:Server/YOLO_Distance/sort.py > /tmp/sort_filterpy.py
+    python tests/test_sort.py /tmp/sort_filterpy.py"""
+import importlib.util
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(TESTS_DIR, "..", "YOLO_Distance"))
+import sort
+from bench_sort import make_sequence
+
+FIXTURE = os.path.join(TESTS_DIR, "fixtures", "sort_golden.json")
+CONFIGS = (
+    {"min_hits": 1, "max_age": 5},  # yolo_distance 설정
+    {"min_hits": 3, "max_age": 1},  # Sort 기본값
+)
+
+
+def load_fixture():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run(tracker, sequence):
+    return [tracker.update(np.array(dets, dtype=np.float64).reshape(-1, 5)) for dets in sequence]
+
+
+@pytest.mark.parametrize("config", range(len(CONFIGS)))
+def test_sort_matches_filterpy_tracker(config, monkeypatch):
+    fixture = load_fixture()
+    monkeypatch.setattr(sort.Sort, "count", 0)  # 트랙 ID는 전역 카운터에서 발급
+    outputs = run(sort.Sort(**fixture["runs"][config]["config"]), fixture["sequence"])
+
+    for frame, (got, want) in enumerate(zip(outputs, fixture["runs"][config]["outputs"])):
+        want = np.array(want, dtype=np.float64).reshape(-1, 5)
+        assert got[:, 4].astype(int).tolist() == want[:, 4].astype(int).tolist(), f"frame {frame}"
+        np.testing.assert_allclose(got[:, :4], want[:, :4], atol=1e-4, err_msg=f"frame {frame}")
+
+
+def test_fixture_exercises_track_lifecycle():
+    fixture = load_fixture()
+    for run_ in fixture["runs"]:
+        ids = [int(row[4]) for frame in run_["outputs"] for row in frame]
+        assert len(set(ids)) > 12  # 미검출로 끊긴 뒤 새 ID로 다시 시작한 트랙 포함
+        assert sum(map(len, run_["outputs"])) > 500
+
+
+def test_predict_keeps_tracks_across_skipped_frames(monkeypatch):
+    monkeypatch.setattr(sort.Sort, "count", 0)
+    tracker = sort.Sort(min_hits=1, max_age=1)
+    for step in range(5):  # x 방향 +4 px/프레임으로 이동하는 객체
+        tracker.update(np.array([[10. + 4 * step, 10., 50. + 4 * step, 40., 0.9]]))
+    before = tracker.kf.get_state()[0]
+
+    # max_age보다 많은 프레임을 건너뛰어도 미검출로 보지 않고 예측 위치로 계속 출력
+    for skipped in range(1, 4):
+        predicted = tracker.predict()
+        assert predicted[:, 4].astype(int).tolist() == [1]
+        assert len(tracker.dropped_ids) == 0
+    assert predicted[0, 0] - before[0] == pytest.approx(12, abs=1)  # 3프레임 x 4 px
+    assert predicted[0, 2] - predicted[0, 0] == pytest.approx(40, abs=1)
+
+    # 다음 추론 프레임의 detection은 같은 트랙에 연결됨
+    moved = np.array([[10. + 4 * 8, 10., 50. + 4 * 8, 40., 0.9]])
+    assert tracker.update(moved)[:, 4].astype(int).tolist() == [1]
+
+
+def record_fixture(old_sort_path, num_objects=12, frames=100, seed=3):
+    """기존 구현으로 detection 시퀀스를 처리한 결과를 기대값으로 기록"""
+    spec = importlib.util.spec_from_file_location("sort_filterpy", old_sort_path)
+    old_sort = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(old_sort)
+
+    sequence = [np.round(dets, 2).tolist() for dets in make_sequence(num_objects, frames, seed)]
+    runs = []
+    for config in CONFIGS:
+        old_sort.KalmanBoxTracker.count = 0
+        outputs = run(old_sort.Sort(**config), sequence)
+        runs.append({"config": config, "outputs": [np.round(out, 6).tolist() for out in outputs]})
+
+    with open(FIXTURE, "w", encoding="utf-8") as f:
+        json.dump({"sequence": sequence, "runs": runs}, f)
+
+
+if __name__ == "__main__":
+    record_fixture(sys.argv[1])
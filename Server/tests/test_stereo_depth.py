@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from stereo_depth import box_bands, box_disparities, compute_disparity_raw, create_sgbm
+
+SHIFT = 20  # 오른쪽 영상의 가로 이동량 (참 시차)
+
+
+@pytest.fixture(scope="module")
+def pair():
+    rng = np.random.default_rng(0)
+    left = rng.integers(0, 255, (480, 640), dtype=np.uint8)
+    return left, np.roll(left, -SHIFT, axis=1)
+
+
+@pytest.fixture(scope="module")
+def stereo():
+    return create_sgbm(64)
+
+
+@pytest.mark.parametrize("box", [
+    [10, 10, 60, 80],      # 왼쪽 경계 근처 (탐색 범위만큼 넓힐 수 없음)
+    [0, 0, 3, 1],          # 왼쪽 위 모서리의 아주 작은 박스
+    [0, 475, 2, 479],      # 왼쪽 아래 모서리
+    [630, 0, 639, 2],      # 오른쪽 위 모서리
+    [600, 470, 639, 479],  # 오른쪽 아래 모서리
+])
+def test_edge_boxes_meet_sgbm_minimum_size(pair, stereo, box):
+    left, right = pair
+    min_width = stereo.getMinDisparity() + stereo.getNumDisparities() + stereo.getBlockSize()
+    for y0, y1, x0, x1, valid_x0 in box_bands([box], left.shape, stereo.getNumDisparities(),
+                                              stereo.getBlockSize(), stereo.getMinDisparity()):
+        assert x1 - x0 >= min_width and y1 - y0 >= stereo.getBlockSize()
+        assert x0 <= valid_x0 <= box[0]
+
+    raw = compute_disparity_raw(stereo, left, right, [box])
+    disparity = box_disparities(raw, [box])[0]
+    assert np.isnan(disparity) or disparity == pytest.approx(SHIFT, abs=1)
+
+
+def test_image_narrower_than_search_range(pair, stereo):
+    left, right = pair
+    raw = compute_disparity_raw(stereo, left[:, :50], right[:, :50], [[0, 0, 10, 10]])
+    assert raw.shape == (480, 50)
+    assert np.isnan(box_disparities(raw, [[0, 0, 10, 10]])[0])
+
+
+def test_band_disparity_matches_full_frame(pair, stereo):
+    left, right = pair
+    boxes = [[100, 100, 300, 300], [400, 50, 500, 120]]
+    banded = box_disparities(compute_disparity_raw(stereo, left, right, boxes), boxes)
+    full = box_disparities(stereo.compute(left, right), boxes)
+    np.testing.assert_allclose(banded, full)
+    np.testing.assert_allclose(banded, SHIFT)
+
+
+@pytest.mark.parametrize("trim", [None, 0.1, 0.25, 0.5])
+def test_box_disparities_matches_reference(trim):
+    rng = np.random.default_rng(1)
+    raw = rng.integers(-16, 2000, (120, 160)).astype(np.int16)
+    raw[20:40, 20:40] = -16
+    boxes = [[10, 10, 100, 60], [20, 20, 40, 40], [150, 110, 200, 200], [5, 5, 5, 5], [0, 0, 160, 120]]
+
+    expected = []
+    for x1, y1, x2, y2 in boxes:
+        x1, x2 = np.clip([x1, x2], 0, 159)
+        y1, y2 = np.clip([y1, y2], 0, 119)
+        values = np.sort(raw[y1:y2, x1:x2].ravel())
+        values = values[values > 0].astype(float)
+        if not values.size:
+            expected.append(np.nan)
+        elif trim is None:
+            expected.append(np.median(values) / 16)
+        else:
+            cut = min(int(len(values) * trim), (len(values) - 1) // 2)
+            expected.append(values[cut:len(values) - cut].mean() / 16)
+    np.testing.assert_allclose(box_disparities(raw, boxes, trim), expected)